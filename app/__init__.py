@@ -1,10 +1,20 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from flasgger import Swagger
 from config import Config
 from flask_jwt_extended import JWTManager
 from swagger_config import swagger_template
+from app.utils.search import include_object
+from app.utils.user_cache import user_cache
+from app.utils.catalog_cache import catalog_cache
+from app.utils.catalog_snapshot import catalog_snapshot
+from app.utils.inventory_events import inventory_events
+from app.utils.passwords import password_hasher
+from app.utils.mailer import mailer
+from app.utils.apidocs import api_docs
+from app.utils.db_pool import engine_options, apply_statement_timeout
+from app.utils.instrumentation import request_metrics
+from app.utils.json_provider import FastJSONProvider
 
 
 db = SQLAlchemy()
@@ -14,29 +24,56 @@ migrate = Migrate()
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    # request_metrics swaps in a timed subclass when metrics are enabled.
+    app.json = FastJSONProvider(app)
     jwt = JWTManager(app)
     app.config["JWT_SECRET_KEY"] = Config.SECRET_KEY
- 
+
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config))
     db.init_app(app)
-    migrate.init_app(app, db)
-    Swagger(app, template=swagger_template)
+    with app.app_context():
+        for engine in db.engines.values():
+            apply_statement_timeout(engine, app.config)
+    from app.utils.loan_archive import include_object as include_partition
+    migrate.init_app(
+        app, db,
+        include_object=lambda *args: include_object(*args) and include_partition(*args)
+    )
+    user_cache.init_app(app)
+    catalog_cache.init_app(app)
+    catalog_snapshot.init_app(app)
+    inventory_events.init_app(app)
+    password_hasher.init_app(app)
+    mailer.init_app(app)
+    api_docs.init_app(app, template=swagger_template)
+    request_metrics.init_app(app)
 
     from app.models import User
 
     @jwt.user_lookup_loader
     def user_lookup_callback(_jwt_header, jwt_data):
-        identity = jwt_data["sub"]
-        return User.query.get(identity)
+        try:
+            identity = int(jwt_data["sub"])
+        except (TypeError, ValueError):
+            return None
+        return user_cache.get(identity, lambda user_id: db.session.get(User, user_id))
 
     from app.routes.books import books_bp
     from app.routes.user import user_bp
     from app.routes.auth import auth_bp    
     from app.routes.loan import loan_bp
+    from app.routes.admin import admin_bp
 
     
     app.register_blueprint(books_bp)
     app.register_blueprint(user_bp)   
     app.register_blueprint(auth_bp)
     app.register_blueprint(loan_bp)
+    app.register_blueprint(admin_bp)
+
+    from app.utils.catalog_import import import_books_command
+    app.cli.add_command(import_books_command)
+    from app.utils.exports import export_command
+    app.cli.add_command(export_command)
 
     return app
@@ -1,12 +1,14 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from app import db 
+from app.utils.search import register_search_ddl
+from app.utils.versioning import register_counter_seed
 
 class User(db.Model):
     __tablename__ = "users"
 
     id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(50), nullable=False)
+    username = db.Column(db.String(50), nullable=False, unique=True, index=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.Text, nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
@@ -18,9 +20,12 @@ class User(db.Model):
 
 class Book(db.Model):
     __tablename__ = "books"
+    __table_args__ = (
+        db.CheckConstraint('available_copies >= 0', name='ck_books_available_copies_nonnegative'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(120), nullable=False)
+    title = db.Column(db.String(120), nullable=False, index=True)
     author = db.Column(db.String(100), nullable=False)
     total_copies = db.Column(db.Integer, nullable=False)
     available_copies = db.Column(db.Integer, nullable=False)
@@ -30,18 +35,115 @@ class Book(db.Model):
     def __repr__(self):
         return f"<Book {self.title}>"
 
+register_search_ddl(Book.__table__)
+
 class Loan(db.Model):
     __tablename__ = "loans"
+    __table_args__ = (
+        db.Index(
+            'ix_loans_open', 'id',
+            postgresql_where=db.text('is_returned = false'),
+            sqlite_where=db.text('is_returned = 0')
+        ),
+        db.Index(
+            'ix_loans_open_due_date', 'due_date',
+            postgresql_where=db.text('is_returned = false'),
+            sqlite_where=db.text('is_returned = 0')
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    book_id = db.Column(db.Integer, db.ForeignKey('books.id'), nullable=False)
-    loan_date = db.Column(db.DateTime, default=datetime.utcnow)
-    due_date = db.Column(db.DateTime, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    book_id = db.Column(db.Integer, db.ForeignKey('books.id'), nullable=False, index=True)
+    loan_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    due_date = db.Column(db.DateTime, nullable=False, index=True)
     is_returned = db.Column(db.Boolean, default=False)
+    returned_at = db.Column(db.DateTime, index=True)
+    # Set by the overdue sweep when it queues a notice for this loan.
+    overdue_notified_at = db.Column(db.DateTime)
 
     user = db.relationship('User', back_populates='loans')
     book = db.relationship('Book', back_populates='loans')
 
     def __repr__(self):
         return f"<Loan {self.user_id} - {self.book_id}>"
+
+
+class LoanArchive(db.Model):
+    __tablename__ = "loans_archive"
+
+    # Returned loans moved out of ``loans`` by the archival task; ids are
+    # kept, so the two tables never share one.
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    book_id = db.Column(db.Integer, db.ForeignKey('books.id', ondelete='CASCADE'), nullable=False, index=True)
+    loan_date = db.Column(db.DateTime, nullable=False)
+    due_date = db.Column(db.DateTime, nullable=False)
+    is_returned = db.Column(db.Boolean, nullable=False, default=True)
+    returned_at = db.Column(db.DateTime, index=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<LoanArchive {self.user_id} - {self.book_id}>"
+
+
+class ChangeCounter(db.Model):
+    __tablename__ = "change_counters"
+
+    # One row per (table, shard); a table's version is the sum of its shards.
+    name = db.Column(db.String(50), primary_key=True)
+    shard = db.Column(db.SmallInteger, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ChangeCounter {self.name}/{self.shard}={self.version}>"
+
+register_counter_seed(ChangeCounter.__table__)
+
+
+class SweepCheckpoint(db.Model):
+    __tablename__ = "sweep_checkpoints"
+
+    name = db.Column(db.String(50), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<SweepCheckpoint {self.name} at {self.last_id}>"
+
+
+class LoanDailyStat(db.Model):
+    __tablename__ = "loan_daily_stats"
+
+    # Each day is split over a few shard rows so concurrent checkouts do not
+    # all queue on one row lock; readers sum the shards.
+    day = db.Column(db.Date, primary_key=True)
+    shard = db.Column(db.SmallInteger, primary_key=True)
+    loans_created = db.Column(db.Integer, nullable=False, default=0)
+    loans_returned = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<LoanDailyStat {self.day}/{self.shard}>"
+
+
+class BookLoanStat(db.Model):
+    __tablename__ = "book_loan_stats"
+
+    book_id = db.Column(db.Integer, db.ForeignKey('books.id', ondelete='CASCADE'), primary_key=True)
+    total_loans = db.Column(db.BigInteger, nullable=False, default=0, index=True)
+    active_loans = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<BookLoanStat {self.book_id}: {self.total_loans}>"
+
+
+class StatSnapshot(db.Model):
+    __tablename__ = "stat_snapshots"
+
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<StatSnapshot {self.name}={self.value}>"
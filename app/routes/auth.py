@@ -1,9 +1,9 @@
 from flask import request, jsonify, Blueprint
-from flasgger import swag_from
+from app.utils.apidocs import swag_from
 from flask_jwt_extended import create_access_token, jwt_required, current_user
-from werkzeug.security import generate_password_hash
+from sqlalchemy.exc import IntegrityError
 from app.models import User, db
-from werkzeug.security import check_password_hash
+from app.utils.passwords import password_hasher
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -36,7 +36,8 @@ auth_bp = Blueprint("auth", __name__)
             }
         },
         400: {'description': 'Missing username or password'},
-        401: {'description': 'Bad username or password'}
+        401: {'description': 'Bad username or password'},
+        503: {'description': 'Password hashing is saturated, retry later'}
     }
 })
 def login():
@@ -48,9 +49,13 @@ def login():
         return jsonify({"msg": "Username and password are required"}), 400
 
     user = User.query.filter_by(username=username).first()
-    if not user or not check_password_hash(user.password_hash, password):
+    if not user or not password_hasher.verify(user.password_hash, password):
         return jsonify({"msg": "Bad username or password"}), 401
 
+    if password_hasher.needs_rehash(user.password_hash):
+        user.password_hash = password_hasher.hash(password)
+        db.session.commit()
+
     access_token = create_access_token(identity=str(user.id))
     return jsonify({'user_token': access_token}), 200
 
@@ -89,7 +94,9 @@ def login():
             'examples': {
                 'application/json': {'error': 'Eksik veri'}
             }
-        }
+        },
+        409: {'description': 'Username or email already taken'},
+        503: {'description': 'Password hashing is saturated, retry later'}
     }
 })
 def register():
@@ -104,10 +111,14 @@ def register():
     new_user = User(
         username=username,
         email=email,
-        password_hash=generate_password_hash(password)
+        password_hash=password_hasher.hash(password)
     )
     db.session.add(new_user)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Username or email already taken"}), 409
     return jsonify({"message": "User registered"}), 201
 
 @auth_bp.route("/who_am_i", methods=["GET"])
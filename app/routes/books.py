@@ -1,9 +1,27 @@
-from flask import Blueprint, request, jsonify
-from flasgger import swag_from
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
+from app.utils.apidocs import swag_from
+from sqlalchemy import select
 from app.models import db, Book
+from app.utils.pagination import parse_keyset_args, keyset_page
+from app.utils.search import search_books
+from app.utils.catalog_cache import catalog_cache
+from app.utils.inventory_events import inventory_events
+from app.utils.catalog_snapshot import catalog_snapshot
+from app.utils.versioning import conditional_on, request_version
+from app.utils.json_provider import row_serializer
 
 books_bp = Blueprint('books', __name__)
 
+STREAM_CHUNK_SIZE = 1000
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+EVENTS_MAX_IDS = 1000
+
+# List endpoints select these columns and build dicts straight from the rows.
+BOOK_FIELDS = ('id', 'title', 'author', 'total_copies', 'available_copies')
+BOOK_COLUMNS = tuple(getattr(Book, name) for name in BOOK_FIELDS)
+books_to_dicts = row_serializer(*BOOK_FIELDS)
+
 @books_bp.route('/books', methods=['POST'])
 @swag_from({
     'tags': ['Books'],
@@ -42,36 +60,174 @@ def add_book():
     book = Book(title=title, author=author, total_copies=total_copies, available_copies=total_copies)
     db.session.add(book)
     db.session.commit()
+    inventory_events.publish([book.id])
+    catalog_snapshot.schedule([book.id])
     return jsonify({'message': 'Kitap eklendi', 'book_id': book.id}), 201
 
 
 @books_bp.route('/books', methods=['GET'])
 @swag_from({
     'tags': ['Books'],
-    'summary': 'Get all books',
+    'summary': 'Get books (keyset paginated)',
+    'description': 'Returns one page of books ordered by id. Pass the returned next_after '
+                   'as after to fetch the next page. With stream=1 the whole catalog is '
+                   'streamed as a JSON array from a server-side cursor, or served from the '
+                   'precompressed catalog snapshot when one is configured.',
+    'parameters': [
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'required': False, 'description': 'Page size (default 50, max 500)'},
+        {'name': 'after', 'in': 'query', 'type': 'integer', 'required': False, 'description': 'Return books with id greater than this'},
+        {'name': 'stream', 'in': 'query', 'type': 'boolean', 'required': False, 'description': 'Stream the full catalog'}
+    ],
+    'responses': {
+        200: {
+            'description': 'A page of books',
+            'examples': {
+                'application/json': {
+                    'books': [
+                        {'id': 1, 'title': '1984', 'author': 'George Orwell', 'total_copies': 5, 'available_copies': 5}
+                    ],
+                    'next_after': None
+                }
+            }
+        },
+        400: {'description': 'Invalid limit or after'}
+    }
+})
+def get_all_books():
+    if request.args.get('stream') in ('1', 'true') and catalog_snapshot.enabled:
+        # Full-catalog reads come from the precomputed snapshot, unless writes
+        # it does not include yet have committed since it was built.
+        response = catalog_snapshot.response(request_version('books'))
+        if response is not None:
+            return response
+    return _get_books()
+
+
+@conditional_on('books')
+def _get_books():
+    if request.args.get('stream') in ('1', 'true'):
+        return Response(stream_with_context(_stream_books()), mimetype='application/json')
+
+    limit, after, error = parse_keyset_args()
+    if error:
+        return jsonify({'error': error}), 400
+
+    def build_page():
+        books, next_after = keyset_page(db.session.query(*BOOK_COLUMNS), Book.id, after, limit)
+        return current_app.json.dumps({
+            'books': books_to_dicts(books),
+            'next_after': next_after
+        })
+
+    body = catalog_cache.get_page(after, limit, request_version('books'), build_page)
+    return current_app.response_class(body, mimetype='application/json'), 200
+
+
+def book_to_dict(book):
+    return {
+        'id': book.id,
+        'title': book.title,
+        'author': book.author,
+        'total_copies': book.total_copies,
+        'available_copies': book.available_copies
+    }
+
+
+def _stream_books():
+    rows = db.session.execute(
+        select(*BOOK_COLUMNS)
+        .order_by(Book.id)
+        .execution_options(yield_per=STREAM_CHUNK_SIZE)
+    )
+    yield '['
+    first = True
+    for row in rows:
+        yield ('' if first else ',') + current_app.json.dumps(book_to_dict(row))
+        first = False
+    yield ']'
+
+
+@books_bp.route('/books/search', methods=['GET'])
+@swag_from({
+    'tags': ['Books'],
+    'summary': 'Search books by title or author',
+    'description': 'Ranked full-text search with typo tolerance on title and author.',
+    'parameters': [
+        {'name': 'q', 'in': 'query', 'type': 'string', 'required': True, 'description': 'Search text'},
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'required': False, 'description': 'Maximum results (default 20, max 100)'}
+    ],
     'responses': {
         200: {
-            'description': 'List of all books',
+            'description': 'Matching books, best match first',
             'examples': {
                 'application/json': [
                     {'id': 1, 'title': '1984', 'author': 'George Orwell', 'total_copies': 5, 'available_copies': 5}
                 ]
             }
-        }
+        },
+        400: {'description': 'Missing q or invalid limit'}
     }
 })
-def get_all_books():
-    books = Book.query.all()
-    return jsonify([
-        {
-            'id': b.id,
-            'title': b.title,
-            'author': b.author,
-            'total_copies': b.total_copies,
-            'available_copies': b.available_copies
-        }
-        for b in books
-    ]), 200
+def search():
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return jsonify({'error': 'q is required'}), 400
+
+    try:
+        limit = int(request.args.get('limit', SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if limit <= 0:
+        return jsonify({'error': 'limit must be positive'}), 400
+
+    rows = search_books(db.session, q, min(limit, SEARCH_MAX_LIMIT))
+    return jsonify(books_to_dicts(rows)), 200
+
+
+@books_bp.route('/books/events', methods=['GET'])
+@swag_from({
+    'tags': ['Books'],
+    'summary': 'Stream inventory changes (Server-Sent Events)',
+    'description': 'Keeps the connection open and sends an inventory event whenever a loan, return, '
+                   'update or delete changes a book. Deleted books arrive as {"book_id": 3, "deleted": true}. '
+                   'A reset event means events were dropped: reconnect and refetch.',
+    'produces': ['text/event-stream'],
+    'parameters': [
+        {'name': 'ids', 'in': 'query', 'type': 'string', 'required': False,
+         'description': 'Comma separated book ids to watch (default: all books, max 1000 ids)'}
+    ],
+    'responses': {
+        200: {
+            'description': 'Event stream',
+            'examples': {
+                'text/event-stream': 'event: inventory\ndata: {"book_id": 1, "available_copies": 4, "total_copies": 5}\n\n'
+            }
+        },
+        400: {'description': 'Invalid ids'},
+        503: {'description': 'Streams are only served by gevent workers (the events service)'}
+    }
+})
+def book_events():
+    if not inventory_events.can_stream:
+        # A thread worker would be tied up for as long as the client stays connected.
+        return jsonify({'error': 'Event streams are served by the gevent workers; connect to the events service'}), 503
+
+    ids = request.args.get('ids')
+    book_ids = None
+    if ids:
+        try:
+            book_ids = {int(book_id) for book_id in ids.split(',') if book_id.strip()}
+        except ValueError:
+            return jsonify({'error': 'ids must be comma separated integers'}), 400
+        if len(book_ids) > EVENTS_MAX_IDS:
+            return jsonify({'error': f'at most {EVENTS_MAX_IDS} ids'}), 400
+
+    # The stream outlives the request, so give back the pooled connection now.
+    db.session.remove()
+    response = Response(inventory_events.stream(book_ids), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @books_bp.route('/books/<int:book_id>', methods=['GET'])
@@ -86,18 +242,17 @@ def get_all_books():
         404: {'description': 'Book not found'}
     }
 })
+@conditional_on('books')
 def get_book(book_id):
-    book = Book.query.get(book_id)
-    if not book:
+    def build():
+        book = db.session.execute(select(*BOOK_COLUMNS).where(Book.id == book_id)).first()
+        return current_app.json.dumps(book_to_dict(book)) if book else None
+
+    body = catalog_cache.get_book(book_id, request_version('books'), build)
+    if body is None:
         return jsonify({'error': 'Kitap bulunamadı'}), 404
 
-    return jsonify({
-        'id': book.id,
-        'title': book.title,
-        'author': book.author,
-        'total_copies': book.total_copies,
-        'available_copies': book.available_copies
-    }), 200
+    return current_app.response_class(body, mimetype='application/json'), 200
 
 
 @books_bp.route('/books/<int:book_id>', methods=['DELETE'])
@@ -119,6 +274,8 @@ def delete_book(book_id):
 
     db.session.delete(book)
     db.session.commit()
+    inventory_events.publish([book_id])
+    catalog_snapshot.schedule([book_id])
     return jsonify({'message': 'Kitap silindi'}), 200
 
 
@@ -146,6 +303,7 @@ def delete_book(book_id):
     ],
     'responses': {
         200: {'description': 'Book updated'},
+        400: {'description': 'Copy counts are not integers or available_copies is outside 0..total_copies'},
         404: {'description': 'Book not found'}
     }
 })
@@ -155,10 +313,19 @@ def update_book(book_id):
         return jsonify({'error': 'Kitap bulunamadı'}), 404
 
     data = request.get_json()
+    total_copies = data.get('total_copies', book.total_copies)
+    available_copies = data.get('available_copies', book.available_copies)
+    if not all(isinstance(value, int) and not isinstance(value, bool) for value in (total_copies, available_copies)):
+        return jsonify({'error': 'total_copies and available_copies must be integers'}), 400
+    if not 0 <= available_copies <= total_copies:
+        return jsonify({'error': 'available_copies must be between 0 and total_copies'}), 400
+
     book.title = data.get('title', book.title)
     book.author = data.get('author', book.author)
-    book.total_copies = data.get('total_copies', book.total_copies)
-    book.available_copies = data.get('available_copies', book.available_copies)
+    book.total_copies = total_copies
+    book.available_copies = available_copies
 
     db.session.commit()
+    inventory_events.publish([book_id])
+    catalog_snapshot.schedule([book_id])
     return jsonify({'message': 'Kitap güncellendi'}), 200
@@ -1,12 +1,23 @@
 from flask import request, jsonify, Blueprint
-from flasgger import swag_from
+from app.utils.apidocs import swag_from
 from flask_jwt_extended import create_access_token, jwt_required, current_user
+from sqlalchemy import bindparam, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
 from app import db
 from app.models import User, Book, Loan
+from app.utils.pagination import parse_keyset_args, keyset_page
+from app.utils.loan_archive import LoanHistory
+from app.utils.inventory_events import inventory_events
+from app.utils.catalog_snapshot import catalog_snapshot
+from app.utils.versioning import conditional_on
+from app.utils.json_provider import row_serializer
+from app.utils.rollups import record_checkouts, record_returns
 from datetime import datetime, timedelta
 
 loan_bp = Blueprint("loan", __name__)
 
+MAX_BATCH_SIZE = 500
+
 @loan_bp.route("/loans/creat", methods=["POST"])
 @swag_from({
     'tags': ['Loans'],
@@ -14,15 +25,18 @@ loan_bp = Blueprint("loan", __name__)
     'security': [{'Bearer': []}],
     'consumes': ['application/x-www-form-urlencoded'],
     'parameters': [
-        {'name': 'username', 'in': 'formData', 'type': 'string', 'required': True, 'description': 'Username of borrower'},
-        {'name': 'book_title', 'in': 'formData', 'type': 'string', 'required': True, 'description': 'Book title'},
+        {'name': 'user_id', 'in': 'formData', 'type': 'integer', 'required': False, 'description': 'ID of borrower (preferred)'},
+        {'name': 'book_id', 'in': 'formData', 'type': 'integer', 'required': False, 'description': 'ID of book (preferred)'},
+        {'name': 'username', 'in': 'formData', 'type': 'string', 'required': False, 'description': 'Username of borrower, when user_id is not given'},
+        {'name': 'book_title', 'in': 'formData', 'type': 'string', 'required': False, 'description': 'Book title, when book_id is not given'},
         {'name': 'loan_date', 'in': 'formData', 'type': 'string', 'format': 'date-time', 'required': False, 'description': 'Loan date (optional)'},
         {'name': 'due_date', 'in': 'formData', 'type': 'string', 'format': 'date-time', 'required': False, 'description': 'Due date (optional)'}
     ],
     'responses': {
         201: {'description': 'Loan created'},
         400: {'description': 'Invalid data'},
-        404: {'description': 'User or Book not found'}
+        404: {'description': 'User or Book not found'},
+        409: {'description': 'Several books share this title; pass book_id'}
     }
 })
 @jwt_required()
@@ -30,102 +44,493 @@ def create_loan():
     if not current_user.is_admin:
         return jsonify({"msg": "Only admins can perform this action"}), 403
     
+    try:
+        user_id = _optional_int(request.form.get("user_id"))
+        book_id = _optional_int(request.form.get("book_id"))
+    except ValueError:
+        return jsonify({"msg": "user_id and book_id must be integers"}), 400
     username = request.form.get("username")
     book_title = request.form.get("book_title")
     loan_date_str = request.form.get("loan_date")
     due_date_str = request.form.get("due_date")
 
-    if not username or not book_title:
-        return jsonify({"msg": "username and book_title are required"}), 400
-
-    user = User.query.filter_by(username=username).first()
-    book = Book.query.filter_by(title=book_title).first()
+    if (user_id is None and not username) or (book_id is None and not book_title):
+        return jsonify({"msg": "user_id or username, and book_id or book_title are required"}), 400
 
-    if not user or not book:
+    user_id, book_id, title_matches = _resolve_loan_parties(user_id, username, book_id, book_title)
+    if title_matches > 1:
+        return jsonify({"msg": "Several books share this title; pass book_id"}), 409
+    if user_id is None or book_id is None:
         return jsonify({"msg": "User or Book not found"}), 404
-    
-
-    if book.available_copies <= 0:
-        return jsonify({"msg": "No available copies of this book"}), 400
 
-    try:
-        loan_date = datetime.fromisoformat(loan_date_str) if loan_date_str else datetime.utcnow()
-    except ValueError:
-        return jsonify({"msg": "Invalid loan_date format"}), 400
+    loan_date, due_date, error = _parse_loan_dates(loan_date_str, due_date_str)
+    if error:
+        return jsonify({"msg": error}), 400
 
-    try:
-        due_date = datetime.fromisoformat(due_date_str) if due_date_str else loan_date + timedelta(days=30)
-    except ValueError:
-        return jsonify({"msg": "Invalid due_date format"}), 400
+    if not _take_copy(book_id):
+        db.session.rollback()
+        return jsonify({"msg": "No available copies of this book"}), 400
 
     loan = Loan(
-        user_id=user.id,
-        book_id=book.id,
+        user_id=user_id,
+        book_id=book_id,
         loan_date=loan_date,
         due_date=due_date
     )
 
-    book.available_copies -= 1
-
     db.session.add(loan)
+    record_checkouts(db.session, [(book_id, loan_date)])
     db.session.commit()
+    inventory_events.publish([book_id])
+    catalog_snapshot.schedule([book_id])
     return jsonify({"message": "Loan created"}), 201
 
-@loan_bp.route("/loans/active", methods=["GET"])
+@loan_bp.route("/loans/batch", methods=["POST"])
 @swag_from({
     'tags': ['Loans'],
-    'summary': 'Get all active loans',
+    'summary': 'Create many loans in one request',
+    'description': 'Resolves all borrowers and books with set-based queries and applies every '
+                   'inventory change in one transaction. Each item is reported separately.',
     'security': [{'Bearer': []}],
+    'consumes': ['application/json'],
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'loans': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'description': 'user_id or username, and book_id or book_title; ids win',
+                            'properties': {
+                                'user_id': {'type': 'integer'},
+                                'username': {'type': 'string'},
+                                'book_id': {'type': 'integer'},
+                                'book_title': {'type': 'string'},
+                                'loan_date': {'type': 'string', 'format': 'date-time'},
+                                'due_date': {'type': 'string', 'format': 'date-time'}
+                            }
+                        }
+                    }
+                },
+                'required': ['loans']
+            }
+        }
+    ],
     'responses': {
         200: {
-            'description': 'List of all active loans',
+            'description': 'Per-item results',
             'examples': {
-                'application/json': [
-                    {'id': 1, 'user_id': '1', 'book_id': '1', 'loan_date': 'Wed, 04 Jun 2025 13:05:58 GMT', 'due_date': '2Mon, 05 May 2025 13:05:58 GMT'}
-                ]
+                'application/json': {
+                    'created': 1, 'failed': 1,
+                    'results': [
+                        {'index': 0, 'ok': True, 'loan_id': 12},
+                        {'index': 1, 'ok': False, 'msg': 'No available copies of this book'}
+                    ]
+                }
             }
-        }
+        },
+        400: {'description': 'Invalid body or too many items'},
+        403: {'description': 'Only admins can perform this action'},
+        409: {'description': 'Inventory changed concurrently, nothing was applied'}
     }
 })
 @jwt_required()
-def get_all_active_loans():
-    loans = Loan.query.all()
-    active_loans = []
-    for loan in loans:
-        if not loan.is_returned:
-            active_loans.append(loan)
-    return jsonify([
+def create_loans_batch():
+    if not current_user.is_admin:
+        return jsonify({"msg": "Only admins can perform this action"}), 403
+
+    items, error = _batch_items("loans")
+    if error:
+        return jsonify({"msg": error}), 400
+
+    results = [None] * len(items)
+    refs = [_batch_loan_refs(item) for item in items]
+    valid = [ref for ref in refs if ref is not None]
+    user_ids = {user_id for user_id, _, _, _ in valid if user_id is not None}
+    usernames = {username for user_id, username, _, _ in valid if user_id is None}
+    book_ids = {book_id for _, _, book_id, _ in valid if book_id is not None}
+    titles = {title for _, _, book_id, title in valid if book_id is None}
+
+    known_users, users = set(), {}
+    for user_id, username in db.session.execute(
+        select(User.id, User.username).where(or_(User.id.in_(user_ids), User.username.in_(usernames)))
+    ):
+        known_users.add(user_id)
+        users[username] = user_id
+
+    # Lock the affected book rows (in id order, to avoid deadlocks between
+    # overlapping batches) so the availability read below stays valid.
+    available, by_title = {}, {}
+    for book_id, title, copies in db.session.execute(
+        select(Book.id, Book.title, Book.available_copies)
+        .where(or_(Book.id.in_(book_ids), Book.title.in_(titles)))
+        .order_by(Book.id)
+        .with_for_update()
+    ):
+        available[book_id] = copies
+        if title in titles:
+            by_title.setdefault(title, []).append(book_id)
+
+    rows, row_indexes, taken = [], [], {}
+    for index, item in enumerate(items):
+        if refs[index] is None:
+            results[index] = {
+                "index": index, "ok": False,
+                "msg": "user_id or username, and book_id or book_title are required"
+            }
+            continue
+
+        user_id, username, book_id, title = refs[index]
+        user_id = user_id if user_id in known_users else users.get(username)
+        if book_id is None:
+            matches = by_title.get(title, [])
+            if len(matches) > 1:
+                results[index] = {"index": index, "ok": False, "msg": "Several books share this title; pass book_id"}
+                continue
+            book_id = matches[0] if matches else None
+        elif book_id not in available:
+            book_id = None
+        if user_id is None or book_id is None:
+            results[index] = {"index": index, "ok": False, "msg": "User or Book not found"}
+            continue
+
+        loan_date, due_date, error = _parse_loan_dates(item.get("loan_date"), item.get("due_date"))
+        if error:
+            results[index] = {"index": index, "ok": False, "msg": error}
+            continue
+
+        if available[book_id] - taken.get(book_id, 0) <= 0:
+            results[index] = {"index": index, "ok": False, "msg": "No available copies of this book"}
+            continue
+
+        taken[book_id] = taken.get(book_id, 0) + 1
+        rows.append({"user_id": user_id, "book_id": book_id, "loan_date": loan_date, "due_date": due_date})
+        row_indexes.append(index)
+
+    if rows:
+        try:
+            _adjust_copies(taken, -1)
+            loan_ids = db.session.scalars(
+                insert(Loan).returning(Loan.id, sort_by_parameter_order=True), rows
+            ).all()
+            record_checkouts(db.session, [(row["book_id"], row["loan_date"]) for row in rows])
+            db.session.commit()
+            inventory_events.publish(taken)
+            catalog_snapshot.schedule(taken)
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({"msg": "Inventory changed concurrently, retry the batch"}), 409
+
+        for index, loan_id in zip(row_indexes, loan_ids):
+            results[index] = {"index": index, "ok": True, "loan_id": loan_id}
+
+    return jsonify({
+        "created": len(rows),
+        "failed": len(items) - len(rows),
+        "results": results
+    }), 200
+
+
+@loan_bp.route("/loans/batch-return", methods=["POST"])
+@swag_from({
+    'tags': ['Loans'],
+    'summary': 'Return many loans in one request',
+    'description': 'Marks the given loans returned and restocks their books in one transaction. '
+                   'Each loan id is reported separately.',
+    'security': [{'Bearer': []}],
+    'consumes': ['application/json'],
+    'parameters': [
         {
-            'loan_id': loan.id, 'user_id': loan.user_id, 'book_id': loan.book_id, 'loan_date':loan.loan_date, 'due_date': loan.due_date
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'loan_ids': {'type': 'array', 'items': {'type': 'integer'}}
+                },
+                'required': ['loan_ids']
+            }
         }
-        for loan in active_loans
-    ]),200
+    ],
+    'responses': {
+        200: {
+            'description': 'Per-item results',
+            'examples': {
+                'application/json': {
+                    'returned': 1, 'failed': 1,
+                    'results': [
+                        {'index': 0, 'loan_id': 12, 'ok': True},
+                        {'index': 1, 'loan_id': 13, 'ok': False, 'msg': 'Loan already returned'}
+                    ]
+                }
+            }
+        },
+        400: {'description': 'Invalid body or too many items'},
+        403: {'description': 'Only admins can perform this action'},
+        409: {'description': 'Loans changed concurrently, nothing was applied'}
+    }
+})
+@jwt_required()
+def return_loans_batch():
+    if not current_user.is_admin:
+        return jsonify({"msg": "Only admins can perform this action"}), 403
+
+    loan_ids, error = _batch_items("loan_ids")
+    if error:
+        return jsonify({"msg": error}), 400
+    if not all(isinstance(loan_id, int) and not isinstance(loan_id, bool) for loan_id in loan_ids):
+        return jsonify({"msg": "loan_ids must be integers"}), 400
+
+    loans = {
+        loan_id: (book_id, is_returned)
+        for loan_id, book_id, is_returned in db.session.execute(
+            select(Loan.id, Loan.book_id, Loan.is_returned).where(Loan.id.in_(loan_ids))
+        )
+    }
+
+    results, to_return, restock = [], [], {}
+    for index, loan_id in enumerate(loan_ids):
+        if loan_id not in loans:
+            results.append({"index": index, "loan_id": loan_id, "ok": False, "msg": "Loan not found"})
+            continue
+
+        book_id, is_returned = loans[loan_id]
+        if is_returned or loan_id in to_return:
+            results.append({"index": index, "loan_id": loan_id, "ok": False, "msg": "Loan already returned"})
+            continue
+
+        to_return.append(loan_id)
+        restock[book_id] = restock.get(book_id, 0) + 1
+        results.append({"index": index, "loan_id": loan_id, "ok": True})
+
+    if to_return:
+        marked = db.session.execute(
+            update(Loan)
+            .where(Loan.id.in_(to_return), Loan.is_returned == False)
+            .values(is_returned=True, returned_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if marked != len(to_return):
+            db.session.rollback()
+            return jsonify({"msg": "Loans changed concurrently, retry the batch"}), 409
+
+        _adjust_copies(restock, 1)
+        record_returns(db.session, restock)
+        db.session.commit()
+        inventory_events.publish(restock)
+        catalog_snapshot.schedule(restock)
+
+    return jsonify({
+        "returned": len(to_return),
+        "failed": len(loan_ids) - len(to_return),
+        "results": results
+    }), 200
+
+@loan_bp.route("/loans/active", methods=["GET"])
+@swag_from({
+    'tags': ['Loans'],
+    'summary': 'Get active loans (keyset paginated)',
+    'security': [{'Bearer': []}],
+    'parameters': [
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'required': False, 'description': 'Page size (default 50, max 500)'},
+        {'name': 'after', 'in': 'query', 'type': 'integer', 'required': False, 'description': 'Return loans with id greater than this'}
+    ],
+    'responses': {
+        200: {
+            'description': 'A page of active loans',
+            'examples': {
+                'application/json': {
+                    'loans': [
+                        {'loan_id': 1, 'user_id': 1, 'book_id': 1, 'loan_date': '2025-06-04T13:05:58Z', 'due_date': '2025-07-04T13:05:58Z'}
+                    ],
+                    'next_after': None
+                }
+            }
+        },
+        400: {'description': 'Invalid limit or after'}
+    }
+})
+@jwt_required()
+@conditional_on('loans')
+def get_all_active_loans():
+    return _loan_page(db.session.query(*_loan_columns(Loan)).filter(Loan.is_returned == False), Loan.id)
 
 @loan_bp.route("/loans/deactive", methods=["GET"])
 @swag_from({
     'tags': ['Loans'],
-    'summary': 'Get all deactive loans',
+    'summary': 'Get returned loans (keyset paginated)',
     'security': [{'Bearer': []}],
+    'parameters': [
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'required': False, 'description': 'Page size (default 50, max 500)'},
+        {'name': 'after', 'in': 'query', 'type': 'integer', 'required': False, 'description': 'Return loans with id greater than this'}
+    ],
     'responses': {
         200: {
-            'description': 'List of all deactive loans',
+            'description': 'A page of returned loans',
             'examples': {
-                'application/json': [
-                    {'id': 1, 'user_id': '1', 'book_id': '1', 'loan_date': 'Wed, 04 Jun 2025 13:05:58 GMT', 'due_date': '2Mon, 05 May 2025 13:05:58 GMT'}
-                ]
+                'application/json': {
+                    'loans': [
+                        {'loan_id': 1, 'user_id': 1, 'book_id': 1, 'loan_date': '2025-06-04T13:05:58Z', 'due_date': '2025-07-04T13:05:58Z'}
+                    ],
+                    'next_after': None
+                }
             }
-        }
+        },
+        400: {'description': 'Invalid limit or after'}
     }
 })
 @jwt_required()
+@conditional_on('loans')
 def get_all_deactive_loans():
-    loans = Loan.query.filter_by(is_returned=True).all()
-    return jsonify([
-        {
-            'loan_id': loan.id, 'user_id': loan.user_id, 'book_id': loan.book_id, 'loan_date':loan.loan_date, 'due_date': loan.due_date
-        }
-        for loan in loans
-    ]),200
+    # Returned loans may have been moved to loans_archive; read both.
+    return _loan_page(
+        db.session.query(*_loan_columns(LoanHistory)).filter(LoanHistory.is_returned == True), LoanHistory.id
+    )
+
+
+def _optional_int(value):
+    return None if value in (None, "") else int(value)
+
+
+def _resolve_loan_parties(user_id, username, book_id, book_title):
+    """Look up the borrower and book ids in a single query.
+
+    Ids win over username/title. Returns ``(user_id, book_id, title_matches)``
+    with ``None`` for anything not found; ``title_matches`` counts books with
+    ``book_title`` so an ambiguous title is refused instead of guessed.
+    """
+    user_query = select(User.id).where(
+        User.id == user_id if user_id is not None else User.username == username
+    )
+    if book_id is not None:
+        book_query = select(Book.id).where(Book.id == book_id)
+        matches_query = select(1)
+    else:
+        book_query = select(func.min(Book.id)).where(Book.title == book_title)
+        matches_query = select(func.count(Book.id)).where(Book.title == book_title)
+
+    return db.session.execute(select(
+        user_query.scalar_subquery(),
+        book_query.scalar_subquery(),
+        matches_query.scalar_subquery(),
+    )).one()
+
+
+def _batch_loan_refs(item):
+    """Return ``(user_id, username, book_id, book_title)`` for a batch item,
+    with ``None`` for the unused half of each pair, or ``None`` if invalid.
+    """
+    if not isinstance(item, dict):
+        return None
+
+    def ref(id_key, name_key):
+        value = item.get(id_key)
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value, None
+        name = item.get(name_key)
+        if value is None and isinstance(name, str) and name:
+            return None, name
+        return None
+
+    user, book = ref("user_id", "username"), ref("book_id", "book_title")
+    if user is None or book is None:
+        return None
+    return user + book
+
+
+def _parse_loan_dates(loan_date_str, due_date_str):
+    try:
+        loan_date = datetime.fromisoformat(loan_date_str) if loan_date_str else datetime.utcnow()
+    except (TypeError, ValueError):
+        return None, None, "Invalid loan_date format"
+
+    try:
+        due_date = datetime.fromisoformat(due_date_str) if due_date_str else loan_date + timedelta(days=30)
+    except (TypeError, ValueError):
+        return None, None, "Invalid due_date format"
+
+    return loan_date, due_date, None
+
+
+def _batch_items(key):
+    data = request.get_json(silent=True) or {}
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return None, f"{key} must be a non-empty list"
+    if len(items) > MAX_BATCH_SIZE:
+        return None, f"At most {MAX_BATCH_SIZE} items per batch"
+    return items, None
+
+
+def _adjust_copies(counts, sign):
+    # One executemany for every touched book; the CHECK constraint on
+    # available_copies rejects the whole transaction if a concurrent writer
+    # got there first.
+    db.session.execute(
+        update(Book.__table__)
+        .where(Book.__table__.c.id == bindparam("b_id"))
+        .values(available_copies=Book.__table__.c.available_copies + bindparam("delta")),
+        [{"b_id": book_id, "delta": sign * count} for book_id, count in sorted(counts.items())]
+    )
+
+
+def _take_copy(book_id):
+    # Check and decrement in one statement so concurrent checkouts of the
+    # last copy cannot both succeed.
+    result = db.session.execute(
+        update(Book)
+        .where(Book.id == book_id, Book.available_copies > 0)
+        .values(available_copies=Book.available_copies - 1)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _put_back_copy(book_id):
+    result = db.session.execute(
+        update(Book)
+        .where(Book.id == book_id)
+        .values(available_copies=Book.available_copies + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _mark_returned(loan_id):
+    result = db.session.execute(
+        update(Loan)
+        .where(Loan.id == loan_id, Loan.is_returned == False)
+        .values(is_returned=True, returned_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+# Loan lists select these columns and build dicts straight from the rows.
+LOAN_FIELDS = ('loan_id', 'user_id', 'book_id', 'loan_date', 'due_date')
+loans_to_dicts = row_serializer(*LOAN_FIELDS)
+
+
+def _loan_columns(entity):
+    return entity.id, entity.user_id, entity.book_id, entity.loan_date, entity.due_date
+
+
+def _loan_page(query, key_column):
+    limit, after, error = parse_keyset_args()
+    if error:
+        return jsonify({"msg": error}), 400
+
+    loans, next_after = keyset_page(query, key_column, after, limit)
+    return jsonify({
+        'loans': loans_to_dicts(loans),
+        'next_after': next_after
+    }), 200
 
 @loan_bp.route("/loan/<int:loan_id>", methods=["POST"])
 @swag_from({
@@ -156,17 +561,18 @@ def deliver_loan(loan_id):
     if not loan:
         return jsonify({"msg": "Loan not found"}), 404
 
-    if loan.is_returned:
+    book_id = loan.book_id
+    if not _mark_returned(loan.id):
+        db.session.rollback()
         return jsonify({"msg": "Loan already returned"}), 400
 
-    book = Book.query.filter_by(id=loan.book_id).first()
-    if not book:
+    if not _put_back_copy(book_id):
+        db.session.rollback()
         return jsonify({"msg": "Book not found"}), 404
 
-    book.available_copies += 1
-    loan.is_returned = True
-    loan.return_date = datetime.utcnow()
-
+    record_returns(db.session, {book_id: 1})
     db.session.commit()
+    inventory_events.publish([book_id])
+    catalog_snapshot.schedule([book_id])
 
     return jsonify({"message": "Book delivered successfully."}), 201
\ No newline at end of file
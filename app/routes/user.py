@@ -1,11 +1,25 @@
+from datetime import datetime
 from flask import Blueprint, request, jsonify
-from app.models import db, User
-from werkzeug.security import generate_password_hash
-from flasgger.utils import swag_from
+from sqlalchemy import select
+from app.models import db, User, Book
+from app.utils.apidocs import swag_from
 from flask_jwt_extended import jwt_required, current_user
+from sqlalchemy.exc import IntegrityError
+from app.utils.user_cache import user_cache
+from app.utils.passwords import password_hasher
+from app.utils.pagination import parse_keyset_args, keyset_page
+from app.utils.loan_archive import LoanHistory
+from app.utils.json_provider import row_serializer
 
 user_bp = Blueprint("user", __name__)
 
+LOAN_STATUSES = {"active": False, "returned": True}
+
+# The user list selects these columns and builds dicts straight from the rows.
+USER_FIELDS = ("id", "username", "email")
+USER_COLUMNS = tuple(getattr(User, name) for name in USER_FIELDS)
+users_to_dicts = row_serializer(*USER_FIELDS)
+
 @user_bp.route("/users", methods=["POST"])
 @swag_from({
     'tags': ['Users'],
@@ -41,7 +55,9 @@ user_bp = Blueprint("user", __name__)
             'examples': {
                 'application/json': {'error': 'Eksik veri'}
             }
-        }
+        },
+        409: {'description': 'Username or email already taken'},
+        503: {'description': 'Password hashing is saturated, retry later'}
     }
 })
 def create_user():
@@ -57,11 +73,15 @@ def create_user():
     new_user = User(
         username=username,
         email=email,
-        password_hash=generate_password_hash(password),
+        password_hash=password_hasher.hash(password),
         is_admin=is_admin
     )
     db.session.add(new_user)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Username or email already taken"}), 409
     return jsonify({"message": "User created"}), 201
 
 
@@ -82,10 +102,8 @@ def create_user():
     }
 })
 def list_users():
-    users = User.query.all()
-    return jsonify([
-        {"id": user.id, "username": user.username, "email": user.email} for user in users
-    ])
+    rows = db.session.execute(select(*USER_COLUMNS))
+    return jsonify(users_to_dicts(rows))
 
 
 @user_bp.route("/users/<int:user_id>", methods=["PUT"])
@@ -120,7 +138,9 @@ def list_users():
     ],
     'responses': {
         200: {'description': 'User updated successfully'},
-        404: {'description': 'User not found'}
+        404: {'description': 'User not found'},
+        409: {'description': 'Username or email already taken'},
+        503: {'description': 'Password hashing is saturated, retry later'}
     }
 })
 @jwt_required()
@@ -133,9 +153,14 @@ def update_user(user_id):
 
     password = data.get("password")
     if password:
-        user.password_hash = generate_password_hash(password)
+        user.password_hash = password_hasher.hash(password)
 
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Username or email already taken"}), 409
+    user_cache.invalidate(user_id)
     return jsonify({"message": "User updated"}), 200
 
 
@@ -164,4 +189,96 @@ def delete_user(user_id):
     user = User.query.get_or_404(user_id)
     db.session.delete(user)
     db.session.commit()
+    user_cache.invalidate(user_id)
     return jsonify({"message": "User deleted"}), 200
+
+
+@user_bp.route("/users/<int:user_id>/loans", methods=["GET"])
+@swag_from({
+    'tags': ['Users'],
+    'summary': "A user's loan history (keyset paginated)",
+    'description': 'Admins can read any user; other users only their own loans. '
+                   'Book title and author are included.',
+    'security': [{'Bearer': []}],
+    'parameters': [
+        {'name': 'user_id', 'in': 'path', 'type': 'integer', 'required': True},
+        {'name': 'status', 'in': 'query', 'type': 'string', 'enum': ['active', 'returned'], 'required': False,
+         'description': 'Only open or only returned loans (default: both)'},
+        {'name': 'from', 'in': 'query', 'type': 'string', 'format': 'date-time', 'required': False,
+         'description': 'Loans made at or after this time'},
+        {'name': 'to', 'in': 'query', 'type': 'string', 'format': 'date-time', 'required': False,
+         'description': 'Loans made before this time'},
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'required': False, 'description': 'Page size (default 50, max 500)'},
+        {'name': 'after', 'in': 'query', 'type': 'integer', 'required': False, 'description': 'Return loans with id greater than this'}
+    ],
+    'responses': {
+        200: {
+            'description': 'A page of the user\'s loans',
+            'examples': {
+                'application/json': {
+                    'loans': [
+                        {'loan_id': 7, 'book_id': 3, 'title': '1984', 'author': 'George Orwell',
+                         'loan_date': '2025-06-04T13:05:58Z', 'due_date': '2025-07-04T13:05:58Z',
+                         'is_returned': False}
+                    ],
+                    'next_after': None
+                }
+            }
+        },
+        400: {'description': 'Invalid status, date, limit or after'},
+        403: {'description': 'Not allowed to read this user\'s loans'},
+        404: {'description': 'User not found'}
+    }
+})
+@jwt_required()
+def list_user_loans(user_id):
+    if not current_user.is_admin and current_user.id != user_id:
+        return jsonify({"error": "You can only view your own loans"}), 403
+
+    limit, after, error = parse_keyset_args()
+    if error:
+        return jsonify({"error": error}), 400
+
+    status = request.args.get("status")
+    if status is not None and status not in LOAN_STATUSES:
+        return jsonify({"error": "status must be active or returned"}), 400
+
+    try:
+        since = _parse_datetime(request.args.get("from"))
+        until = _parse_datetime(request.args.get("to"))
+    except ValueError:
+        return jsonify({"error": "from and to must be ISO 8601 dates"}), 400
+
+    # Columns straight from a join; LoanHistory also covers loans moved to
+    # loans_archive.
+    query = db.session.query(
+        LoanHistory.id, LoanHistory.book_id, Book.title, Book.author,
+        LoanHistory.loan_date, LoanHistory.due_date, LoanHistory.is_returned
+    ).join(Book, Book.id == LoanHistory.book_id).filter(LoanHistory.user_id == user_id)
+    if status is not None:
+        query = query.filter(LoanHistory.is_returned == LOAN_STATUSES[status])
+    if since is not None:
+        query = query.filter(LoanHistory.loan_date >= since)
+    if until is not None:
+        query = query.filter(LoanHistory.loan_date < until)
+
+    loans, next_after = keyset_page(query, LoanHistory.id, after, limit)
+    if not loans and not after and db.session.get(User, user_id) is None:
+        return jsonify({"error": "User not found"}), 404
+
+    return jsonify({
+        'loans': [
+            {
+                'loan_id': loan.id, 'book_id': loan.book_id,
+                'title': loan.title, 'author': loan.author,
+                'loan_date': loan.loan_date, 'due_date': loan.due_date,
+                'is_returned': bool(loan.is_returned)
+            }
+            for loan in loans
+        ],
+        'next_after': next_after
+    }), 200
+
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value) if value else None
@@ -0,0 +1,47 @@
+import logging
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from app.utils.loan_archive import archive_batch, ensure_loan_partitions
+from celery_worker import celery
+
+logger = logging.getLogger(__name__)
+
+
+@celery.task(bind=True)
+def archive_returned_loans(self, max_batches=None):
+    """Move returned loans older than ``LOAN_ARCHIVE_AFTER_DAYS`` to loans_archive.
+
+    Each batch is committed on its own, so the hot table is only locked a
+    batch at a time. With ``max_batches`` the task re-queues itself after
+    that many batches instead of running to the end in one go.
+    """
+    horizon = datetime.utcnow() - timedelta(days=current_app.config["LOAN_ARCHIVE_AFTER_DAYS"])
+    batch_size = current_app.config["LOAN_ARCHIVE_BATCH_SIZE"]
+
+    moved = batches = 0
+    while True:
+        count = archive_batch(db.session, horizon, batch_size)
+        db.session.commit()
+        moved += count
+        batches += 1
+        if count < batch_size:
+            break
+        if max_batches and batches >= max_batches:
+            self.apply_async(kwargs={"max_batches": max_batches})
+            break
+
+    logger.info("Loan archive moved %d loans in %d batches", moved, batches)
+    return {"loans": moved, "batches": batches}
+
+
+@celery.task
+def maintain_loan_partitions():
+    """Create the upcoming monthly partitions of ``loans`` (Postgres only)."""
+    created = ensure_loan_partitions(db.session.connection(), current_app.config["LOAN_PARTITION_MONTHS_AHEAD"])
+    db.session.commit()
+    if created:
+        logger.info("Created loan partitions: %s", ", ".join(created))
+    return created
@@ -0,0 +1,31 @@
+import logging
+
+from app.utils.catalog_snapshot import catalog_snapshot
+from celery_worker import celery
+
+logger = logging.getLogger(__name__)
+
+
+@celery.task(ignore_result=True)
+def refresh_catalog_snapshot(pending=False):
+    """Rebuild the on-disk catalog snapshot.
+
+    ``catalog_snapshot.schedule`` queues this with ``pending`` once per
+    debounce window; it then reads back only the books changed since the
+    last rebuild. Beat runs it without ``pending`` as a periodic full rebuild
+    that also covers any change lost to a Redis or broker outage.
+    """
+    if not catalog_snapshot.enabled:
+        return None
+    book_ids = catalog_snapshot.take_pending() if pending else None
+    if book_ids == []:
+        return None
+    try:
+        manifest = catalog_snapshot.build(book_ids)
+    except Exception:
+        if pending:
+            catalog_snapshot.restore_pending(book_ids)
+        raise
+    logger.info("Catalog snapshot at books version %d: %d books, %d bytes",
+                manifest["version"], manifest["books"], manifest["sizes"]["identity"])
+    return manifest["version"]
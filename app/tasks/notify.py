@@ -0,0 +1,124 @@
+import logging
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import or_, select, update
+
+from app import db
+from app.models import Book, Loan, SweepCheckpoint, User
+from app.utils.mailer import mailer
+from celery_worker import celery
+
+logger = logging.getLogger(__name__)
+
+OVERDUE_SWEEP = "overdue"
+
+
+def _lock_checkpoint():
+    checkpoint = db.session.execute(
+        select(SweepCheckpoint).where(SweepCheckpoint.name == OVERDUE_SWEEP).with_for_update()
+    ).scalar_one_or_none()
+    if checkpoint is None:
+        checkpoint = SweepCheckpoint(name=OVERDUE_SWEEP, last_id=0)
+        db.session.add(checkpoint)
+    if checkpoint.last_id == 0 or checkpoint.started_at is None:
+        checkpoint.started_at = datetime.utcnow()
+    return checkpoint
+
+
+def sweep_chunk(chunk_size, batch_size, reminder_days=0):
+    """Process the next chunk of overdue loans in its own short transaction.
+
+    Only loans never notified, or last notified ``reminder_days`` or more
+    before this sweep started, are picked. They are stamped in the same
+    commit as the checkpoint and queued once it has committed, so a failed
+    chunk queues nothing and is simply retried.
+
+    Returns the number of loans found; fewer than ``chunk_size`` means the
+    sweep reached the end and the checkpoint was reset for the next run.
+    """
+    checkpoint = _lock_checkpoint()
+    started_at = checkpoint.started_at
+    due = Loan.overdue_notified_at.is_(None)
+    if reminder_days:
+        due = or_(due, Loan.overdue_notified_at <= started_at - timedelta(days=reminder_days))
+    loan_ids = db.session.execute(
+        select(Loan.id)
+        .where(
+            Loan.is_returned == False,
+            Loan.due_date < started_at,
+            Loan.id > checkpoint.last_id,
+            due
+        )
+        .order_by(Loan.id)
+        .limit(chunk_size)
+    ).scalars().all()
+
+    now = datetime.utcnow()
+    if loan_ids:
+        db.session.execute(
+            update(Loan).where(Loan.id.in_(loan_ids)).values(overdue_notified_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    if len(loan_ids) < chunk_size:
+        checkpoint.last_id = 0
+        checkpoint.started_at = None
+    else:
+        checkpoint.last_id = loan_ids[-1]
+    checkpoint.updated_at = now
+    db.session.commit()
+
+    for start in range(0, len(loan_ids), batch_size):
+        notify_overdue.delay(loan_ids[start:start + batch_size])
+    return len(loan_ids)
+
+
+@celery.task(bind=True)
+def sweep_overdue_loans(self, max_chunks=None):
+    """Walk open loans past their due date in id order and queue notices
+    for those not notified yet (or due a reminder).
+
+    Progress is checkpointed after every chunk, so an interrupted sweep picks
+    up where it stopped. With ``max_chunks`` the task re-queues itself after
+    that many chunks instead of running to the end in one go.
+    """
+    chunk_size = current_app.config["OVERDUE_SWEEP_CHUNK_SIZE"]
+    batch_size = current_app.config["OVERDUE_NOTIFY_BATCH_SIZE"]
+    reminder_days = current_app.config["OVERDUE_REMINDER_DAYS"]
+
+    found = chunks = 0
+    while True:
+        count = sweep_chunk(chunk_size, batch_size, reminder_days)
+        found += count
+        chunks += 1
+        if count < chunk_size:
+            break
+        if max_chunks and chunks >= max_chunks:
+            self.apply_async(kwargs={"max_chunks": max_chunks})
+            break
+
+    logger.info("Overdue sweep queued %d loans in %d chunks", found, chunks)
+    return {"loans": found, "chunks": chunks}
+
+
+@celery.task
+def notify_overdue(loan_ids):
+    rows = db.session.execute(
+        select(Loan.id, Loan.due_date, User.username, User.email, Book.title)
+        .join(User, Loan.user_id == User.id)
+        .join(Book, Loan.book_id == Book.id)
+        .where(Loan.id.in_(loan_ids), Loan.is_returned == False)
+    ).all()
+    messages = [
+        mailer.message(
+            row.email,
+            f"Overdue: {row.title}",
+            f"Hello {row.username},\n\n'{row.title}' was due on {row.due_date:%Y-%m-%d}. "
+            f"Please return it to the library as soon as possible.\n"
+        )
+        for row in rows
+    ]
+    sent, failures = mailer.send_many(messages)
+    if failures:
+        logger.warning("Overdue notices: %d sent, %d failed", sent, len(failures))
+    return sent
@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from app import db
+from app.models import Loan, StatSnapshot
+from celery_worker import celery
+
+OVERDUE_LOANS = "overdue_loans"
+
+
+@celery.task
+def refresh_overdue_stats():
+    """Store the current number of open loans past their due date.
+
+    Overdue-ness changes with the clock rather than with writes, so it is
+    snapshotted periodically instead of maintained by the loan endpoints.
+    """
+    now = datetime.utcnow()
+    overdue = db.session.execute(
+        select(func.count()).select_from(Loan).where(Loan.is_returned == False, Loan.due_date < now)
+    ).scalar_one()
+    db.session.merge(StatSnapshot(name=OVERDUE_LOANS, value=overdue, refreshed_at=now))
+    db.session.commit()
+    return overdue
@@ -0,0 +1,61 @@
+import json
+import threading
+
+from flask import Response
+
+
+def swag_from(specs):
+    """Attach a Swagger spec dict to a view, as flasgger's ``swag_from`` does.
+
+    Only the ``specs_dict`` attribute flasgger reads is set, so route modules
+    do not import flasgger (and its jsonschema/yaml/mistune stack) and views
+    are not wrapped in an extra call frame.
+    """
+    def decorator(view):
+        view.specs_dict = specs
+        return view
+    return decorator
+
+
+class ApiDocs:
+    """Serves ``/apidocs`` through flasgger when ``API_DOCS_ENABLED`` is set.
+
+    flasgger is only imported when docs are enabled. The spec is built from
+    the route decorators on the first request for it and the rendered JSON
+    is kept for the life of the process.
+    """
+
+    def __init__(self):
+        self.swagger = None
+        self._rendered = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app, template=None):
+        self.swagger = None
+        self._rendered = {}
+        if not app.config["API_DOCS_ENABLED"]:
+            return
+
+        from flasgger import Swagger
+        self.swagger = Swagger(app, template=template)
+        for endpoint in self.swagger.endpoints:
+            app.view_functions[f"flasgger.{endpoint}"] = self._spec_view(endpoint)
+        app.extensions["api_docs"] = self
+
+    def spec_json(self, endpoint):
+        body = self._rendered.get(endpoint)
+        if body is None:
+            with self._lock:
+                body = self._rendered.get(endpoint)
+                if body is None:
+                    body = json.dumps(self.swagger.get_apispecs(endpoint))
+                    self._rendered[endpoint] = body
+        return body
+
+    def _spec_view(self, endpoint):
+        def view():
+            return Response(self.spec_json(endpoint), mimetype="application/json")
+        return view
+
+
+api_docs = ApiDocs()
@@ -0,0 +1,160 @@
+import logging
+import threading
+import time
+
+from app.utils.pagination import DEFAULT_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class _MemoryBackend:
+    MAX_ENTRIES = 10000
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._values[key]
+                return None
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            if len(self._values) >= self.MAX_ENTRIES:
+                self._evict()
+            self._values[key] = (time.monotonic() + ttl, value)
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [key for key, (expires, _) in self._values.items() if expires <= now]
+        if not expired:
+            expired = list(self._values)[:len(self._values) // 10 or 1]
+        for key in expired:
+            del self._values[key]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class _DisabledBackend:
+    """Caches nothing; reads always go to the database."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def clear(self):
+        pass
+
+
+class _RedisBackend:
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl):
+        self.client.setex(key, ttl, value)
+
+    def clear(self):
+        keys = list(self.client.scan_iter("catalog:*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class CatalogCache:
+    """Read-through cache of serialized book and catalog page responses.
+
+    Keys carry the ``books`` change counter the reader saw before building
+    the body (``catalog:book:<id>:v<n>``), so a write that commits moves
+    every reader to new keys at once: nothing has to be invalidated, and a
+    body built before a commit can only be stored under the version it was
+    read at. Old versions simply expire after ``CATALOG_CACHE_TTL``.
+
+    Uses Redis when ``CATALOG_CACHE_REDIS_URL`` is set and an in-process
+    dictionary otherwise. An in-process cache would go stale in every other
+    worker, so it is only used with a single web process; with more
+    ``GUNICORN_WORKERS`` and no Redis, caching is turned off.
+
+    Only pages of the default size are cached, so clients choosing their own
+    ``limit`` cannot fill the cache.
+    """
+
+    def __init__(self):
+        self.backend = _MemoryBackend()
+        self.ttl = 300
+        self._errors = ()
+
+    def init_app(self, app):
+        self.ttl = app.config["CATALOG_CACHE_TTL"]
+        url = app.config.get("CATALOG_CACHE_REDIS_URL")
+        if url:
+            import redis
+            self.backend = _RedisBackend(redis.Redis.from_url(url, socket_timeout=0.25))
+            self._errors = (redis.RedisError,)
+        elif app.config["GUNICORN_WORKERS"] > 1:
+            logger.warning("CATALOG_CACHE_REDIS_URL is not set; catalog caching is off "
+                           "with %s gunicorn workers", app.config["GUNICORN_WORKERS"])
+            self.backend = _DisabledBackend()
+            self._errors = ()
+        else:
+            self.backend = _MemoryBackend()
+            self._errors = ()
+        app.extensions["catalog_cache"] = self
+
+    @staticmethod
+    def book_key(book_id, version):
+        return f"catalog:book:{book_id}:v{version}"
+
+    @staticmethod
+    def page_key(after, limit, version):
+        return f"catalog:page:{after}:{limit}:v{version}"
+
+    def get_book(self, book_id, version, build):
+        """``version`` is the ``books`` change counter, read before ``build`` runs."""
+        return self._read_through(self.book_key(book_id, version), build)
+
+    def get_page(self, after, limit, version, build):
+        if limit != DEFAULT_PAGE_SIZE:
+            return build()
+        return self._read_through(self.page_key(after, limit, version), build)
+
+    def clear(self):
+        try:
+            self.backend.clear()
+        except self._errors:
+            pass
+
+    def _read_through(self, key, build):
+        body = self._get(key)
+        if body is None:
+            body = build()
+            if body is not None:
+                self._set(key, body)
+        return body
+
+    # A cache outage degrades to uncached reads instead of failing requests.
+    def _get(self, key):
+        try:
+            return self.backend.get(key)
+        except self._errors:
+            return None
+
+    def _set(self, key, body):
+        try:
+            self.backend.set(key, body, self.ttl)
+        except self._errors:
+            pass
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,214 @@
+import csv
+import io
+import json
+import time
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import text
+
+from app import db
+from app.utils.catalog_cache import catalog_cache
+from app.utils.catalog_snapshot import catalog_snapshot
+from app.utils.versioning import mark_changed
+
+CHUNK_SIZE = 5000
+MAX_REPORTED_REJECTIONS = 100
+FORMATS = ("csv", "ndjson")
+
+_CREATE_STAGING = {
+    "postgresql": "CREATE TEMP TABLE books_import_staging "
+                  "(title varchar(120), author varchar(100), total_copies integer) ON COMMIT DROP",
+}
+# Everything else stages with executemany into a temporary table dropped at the end.
+_CREATE_STAGING_GENERIC = (
+    "CREATE TEMPORARY TABLE books_import_staging "
+    "(title varchar(120), author varchar(100), total_copies integer)"
+)
+
+# Titles already in the catalog under the same author are skipped rather than
+# duplicated, so a feed can be re-imported safely. A title listed more than
+# once in the feed is inserted once, with its largest total_copies.
+_MERGE_STAGING = text("""
+    INSERT INTO books (title, author, total_copies, available_copies)
+    SELECT s.title, s.author, MAX(s.total_copies), MAX(s.total_copies)
+    FROM books_import_staging s
+    LEFT JOIN books b ON b.title = s.title AND b.author = s.author
+    WHERE b.id IS NULL
+    GROUP BY s.title, s.author
+""")
+
+_COUNT_DISTINCT_STAGING = text(
+    "SELECT COUNT(*) FROM (SELECT DISTINCT title, author FROM books_import_staging) s"
+)
+
+_INSERT_STAGING = text(
+    "INSERT INTO books_import_staging (title, author, total_copies) "
+    "VALUES (:title, :author, :total_copies)"
+)
+
+
+def _read_records(stream, fmt):
+    # Undecodable bytes become lone surrogates, so a bad line is rejected
+    # by _validate instead of aborting the whole import.
+    lines = (line.decode("utf-8", "surrogateescape") for line in stream)
+    if fmt == "csv":
+        for record in csv.DictReader(lines):
+            yield record
+    else:
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        return None
+    try:
+        value.encode("utf-8")
+    except UnicodeEncodeError:
+        return None
+    return value.strip()
+
+
+def _validate(record):
+    if not isinstance(record, dict):
+        return None, "Unparseable row"
+
+    title = _text(record.get("title"))
+    author = _text(record.get("author"))
+    if title is None or author is None:
+        return None, "title and author must be UTF-8 text"
+    if not title or not author:
+        return None, "title and author are required"
+    if len(title) > 120 or len(author) > 100:
+        return None, "title or author too long"
+
+    value = record.get("total_copies")
+    try:
+        if isinstance(value, (bool, float)):
+            raise TypeError
+        total_copies = int(value)
+    except (TypeError, ValueError):
+        return None, "total_copies must be an integer"
+    if total_copies < 0:
+        return None, "total_copies must not be negative"
+
+    return {"title": title, "author": author, "total_copies": total_copies}, None
+
+
+def _copy_chunk(connection, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow((row["title"], row["author"], row["total_copies"]))
+    buffer.seek(0)
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            "COPY books_import_staging (title, author, total_copies) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def import_books(stream, fmt, chunk_size=CHUNK_SIZE):
+    """Stream a CSV or NDJSON catalog feed from ``stream`` into ``books``.
+
+    Rows are validated and loaded into a staging table ``chunk_size`` at a
+    time (``COPY`` on Postgres, ``executemany`` on SQLite), then merged in one
+    statement. Returns a report dict.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format {fmt!r}")
+
+    started = time.perf_counter()
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+    if dialect != "postgresql":
+        # These temp tables outlive a failed import on a pooled connection.
+        connection.execute(text("DROP TABLE IF EXISTS books_import_staging"))
+    connection.execute(text(_CREATE_STAGING.get(dialect, _CREATE_STAGING_GENERIC)))
+
+    staged, rejected, rejections = 0, 0, []
+    chunk = []
+
+    def flush():
+        if dialect == "postgresql":
+            _copy_chunk(connection, chunk)
+        else:
+            connection.execute(_INSERT_STAGING, chunk)
+        chunk.clear()
+
+    try:
+        for line_number, record in enumerate(_read_records(stream, fmt), start=1):
+            row, error = _validate(record)
+            if error:
+                rejected += 1
+                if len(rejections) < MAX_REPORTED_REJECTIONS:
+                    rejections.append({"row": line_number, "error": error})
+                continue
+
+            chunk.append(row)
+            staged += 1
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+
+        distinct = connection.execute(_COUNT_DISTINCT_STAGING).scalar()
+        inserted = connection.execute(_MERGE_STAGING).rowcount
+        if inserted:
+            mark_changed(db.session, "books")
+        if dialect != "postgresql":
+            connection.execute(text("DROP TABLE books_import_staging"))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    elapsed = time.perf_counter() - started
+    return {
+        "inserted": inserted,
+        "skipped_existing": distinct - inserted,
+        "skipped_duplicates": staged - distinct,
+        "rejected": rejected,
+        "rejections": rejections,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round((staged + rejected) / elapsed, 1) if elapsed else None,
+    }
+
+
+@click.command("import-books")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(FORMATS), default=None,
+              help="Input format; guessed from the file extension by default.")
+@click.option("--chunk-size", type=int, default=CHUNK_SIZE, show_default=True)
+@with_appcontext
+def import_books_command(path, fmt, chunk_size):
+    """Bulk import books from a CSV or NDJSON file."""
+    if fmt is None:
+        fmt = "ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv"
+
+    with open(path, "rb") as stream:
+        report = import_books(stream, fmt, chunk_size=chunk_size)
+    if report["inserted"]:
+        catalog_cache.clear()
+        catalog_snapshot.schedule()
+
+    click.echo(
+        f"Inserted {report['inserted']}, skipped {report['skipped_existing']} existing "
+        f"and {report['skipped_duplicates']} repeated, "
+        f"rejected {report['rejected']} in {report['seconds']}s "
+        f"({report['rows_per_second']} rows/s)"
+    )
+    for rejection in report["rejections"]:
+        click.echo(f"  row {rejection['row']}: {rejection['error']}", err=True)
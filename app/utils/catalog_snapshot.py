@@ -0,0 +1,315 @@
+import fcntl
+import gzip
+import hashlib
+import heapq
+import json
+import logging
+import os
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from itertools import islice
+from operator import itemgetter
+
+from flask import current_app, request, send_file
+from sqlalchemy import select
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "current.json"
+
+# Content-Encoding -> file suffix, in order of preference on equal quality.
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+# Books read from the database, encoded, and read back from the previous
+# snapshot at a time; a rebuild never holds the whole catalog in memory.
+BATCH_SIZE = 5000
+READ_CHUNK_SIZE = 1 << 20
+
+
+class CatalogSnapshot:
+    """The full catalog, serialized and compressed ahead of time on disk.
+
+    ``build`` writes the ``/books?stream=1`` body as plain JSON, gzip and
+    (when the ``brotli`` package is installed) brotli files named after their
+    content digest, then atomically swaps ``current.json`` to point at them.
+    The manifest also stamps the ``books`` change counter the snapshot was
+    read at. ``response`` serves the best encoding the client accepts straight
+    from the file, unless the snapshot is older than the live counter.
+
+    ``CATALOG_SNAPSHOT_DIR`` turns the snapshot on; it must be shared by the
+    web processes and the Celery worker that rebuilds it. Writes are batched
+    through ``CATALOG_SNAPSHOT_REDIS_URL``; without it only the periodic full
+    rebuild refreshes the snapshot.
+    """
+
+    # Ids changed since the last rebuild, a flag asking for a full one, and
+    # a flag held while a rebuild is queued.
+    PENDING_KEY = "catalog:snapshot:pending"
+    FULL_KEY = "catalog:snapshot:full"
+    QUEUED_KEY = "catalog:snapshot:queued"
+
+    def __init__(self):
+        self.directory = None
+        self.brotli_quality = 9
+        self.debounce = 5
+        self.redis = None
+        self._errors = ()
+
+    def init_app(self, app):
+        self.directory = app.config.get("CATALOG_SNAPSHOT_DIR")
+        self.brotli_quality = app.config["CATALOG_SNAPSHOT_BROTLI_QUALITY"]
+        self.debounce = app.config["CATALOG_SNAPSHOT_DEBOUNCE"]
+        url = app.config.get("CATALOG_SNAPSHOT_REDIS_URL")
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        if self.directory and url:
+            import redis
+            from kombu.exceptions import OperationalError
+            self.redis = redis.Redis.from_url(url, socket_timeout=0.25)
+            self._errors = (redis.RedisError, OperationalError)
+        else:
+            self.redis = None
+            self._errors = ()
+        app.extensions["catalog_snapshot"] = self
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def manifest(self):
+        try:
+            with open(os.path.join(self.directory, MANIFEST)) as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return None
+
+    def schedule(self, book_ids=None):
+        """Record that ``book_ids`` changed (everything when ``None``).
+
+        Call after commit. The ids collect in a Redis set and at most one
+        rebuild is queued per ``CATALOG_SNAPSHOT_DEBOUNCE`` seconds, however
+        many writes arrive meanwhile. A Redis or broker outage only delays
+        the snapshot until the periodic full rebuild, so it is logged rather
+        than raised.
+        """
+        if self.redis is None or (book_ids is not None and not book_ids):
+            return
+        from app.tasks.catalog import refresh_catalog_snapshot
+        try:
+            pipe = self.redis.pipeline()
+            if book_ids is None:
+                pipe.set(self.FULL_KEY, 1)
+            else:
+                pipe.sadd(self.PENDING_KEY, *book_ids)
+            # The flag outlives a rebuild that failed to queue, so a broker
+            # outage stalls one request per expiry rather than every write.
+            pipe.set(self.QUEUED_KEY, 1, nx=True, ex=max(self.debounce * 10, 60))
+            if pipe.execute()[-1]:
+                refresh_catalog_snapshot.apply_async(
+                    kwargs={"pending": True}, countdown=self.debounce, retry=False
+                )
+        except self._errors as error:
+            logger.warning("Could not queue catalog snapshot rebuild: %s", error)
+
+    def take_pending(self):
+        """Claim the changes recorded by ``schedule``.
+
+        Returns the changed book ids, or ``None`` when a full rebuild was
+        asked for. Writes from here on queue a new rebuild.
+        """
+        self.redis.delete(self.QUEUED_KEY)
+        pipe = self.redis.pipeline()
+        pipe.getdel(self.FULL_KEY)
+        pipe.smembers(self.PENDING_KEY)
+        pipe.delete(self.PENDING_KEY)
+        full, book_ids, _ = pipe.execute()
+        return None if full else sorted(int(book_id) for book_id in book_ids)
+
+    def restore_pending(self, book_ids):
+        """Put back ids whose rebuild failed, for the next one to pick up."""
+        try:
+            if book_ids is None:
+                self.redis.set(self.FULL_KEY, 1)
+            elif book_ids:
+                self.redis.sadd(self.PENDING_KEY, *book_ids)
+        except self._errors as error:
+            logger.warning("Could not restore pending catalog changes: %s", error)
+
+    def response(self, version):
+        """Return a file response for the current snapshot.
+
+        Returns ``None`` without a snapshot, or when it was read before
+        ``version`` of the ``books`` counter, so callers fall back to the
+        live stream instead of serving a stale catalog.
+        """
+        manifest = self.manifest()
+        if manifest is None or manifest["version"] < version:
+            return None
+
+        encoding = request.accept_encodings.best_match(
+            [name for name in ENCODINGS if name in manifest["encodings"]] + ["identity"],
+            default="identity"
+        )
+        path = manifest["file"] + ENCODINGS.get(encoding, "")
+        # send_file hands the open file to the server's wsgi.file_wrapper,
+        # which gunicorn answers with sendfile().
+        response = send_file(
+            os.path.join(self.directory, path), mimetype="application/json",
+            etag=f"{manifest['etag']}-{encoding}", conditional=True
+        )
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        response.headers["X-Catalog-Version"] = str(manifest["version"])
+        return response
+
+    def build(self, book_ids=None):
+        """Rebuild the snapshot and return its manifest.
+
+        With ``book_ids`` only those books are read back from the database
+        and merged into the previous snapshot as it is read from disk;
+        without, or when there is no previous snapshot, the whole catalog is
+        read. Either way books are written out in batches as they arrive.
+
+        The stamped ``version`` is read after ``book_ids`` were claimed and
+        before any row: every change it counts is either in this snapshot or
+        still pending for the next rebuild.
+        """
+        from app import db
+        from app.models import Book
+        from app.routes.books import BOOK_COLUMNS, books_to_dicts
+        from app.utils.versioning import current_version
+
+        with self._lock():
+            # Read the counter first: the rows read below are at least that new.
+            version = current_version(db.session, "books")
+            previous = self.manifest()
+            try:
+                if book_ids is None or previous is None:
+                    rows = db.session.execute(
+                        select(*BOOK_COLUMNS).order_by(Book.id).execution_options(yield_per=BATCH_SIZE)
+                    )
+                    batches = (books_to_dicts(partition) for partition in rows.partitions())
+                else:
+                    changed = books_to_dicts(db.session.execute(
+                        select(*BOOK_COLUMNS).where(Book.id.in_(book_ids)).order_by(Book.id)
+                    ))
+                    removed = set(book_ids)
+                    kept = (
+                        book for book in _read_books(os.path.join(self.directory, previous["file"]))
+                        if book["id"] not in removed
+                    )
+                    batches = _batched(heapq.merge(kept, changed, key=itemgetter("id")), BATCH_SIZE)
+                return self._publish(batches, version, previous)
+            finally:
+                db.session.rollback()
+
+    def _publish(self, batches, version, previous):
+        try:
+            import brotli
+        except ImportError:
+            brotli = None
+
+        building = os.path.join(self.directory, "building.json")
+        digest = hashlib.blake2b(digest_size=16)
+        count = 0
+        with ExitStack() as stack:
+            plain = stack.enter_context(open(building, "wb"))
+            gz = stack.enter_context(gzip.GzipFile(
+                filename="", mode="wb", compresslevel=9, mtime=0,
+                fileobj=stack.enter_context(open(building + ENCODINGS["gzip"], "wb"))
+            ))
+            if brotli is not None:
+                br = stack.enter_context(open(building + ENCODINGS["br"], "wb"))
+                compressor = brotli.Compressor(quality=self.brotli_quality)
+
+            def write(chunk):
+                digest.update(chunk)
+                plain.write(chunk)
+                gz.write(chunk)
+                if brotli is not None:
+                    br.write(compressor.process(chunk))
+
+            write(b"[")
+            for books in batches:
+                if not books:
+                    continue
+                # One dumps per batch; its brackets give way to the outer array's.
+                body = current_app.json.dumps(books, separators=(",", ":")).encode()
+                write((b"," if count else b"") + body[1:-1])
+                count += len(books)
+            write(b"]")
+            if brotli is not None:
+                br.write(compressor.finish())
+
+        name = f"catalog-{digest.hexdigest()}.json"
+        encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+        sizes = {}
+        for encoding in encodings:
+            suffix = ENCODINGS.get(encoding, "")
+            sizes[encoding] = os.path.getsize(building + suffix)
+            os.replace(building + suffix, os.path.join(self.directory, name + suffix))
+        manifest = {
+            "version": version,
+            "etag": digest.hexdigest(),
+            "file": name,
+            "encodings": [encoding for encoding in encodings if encoding != "identity"],
+            "books": count,
+            "sizes": sizes,
+            "generated_at": datetime.utcnow().isoformat(),
+        }
+        self._write(MANIFEST, json.dumps(manifest, indent=2).encode())
+
+        # Keep the previous files: a reader may have just read the old manifest.
+        keep = {name, MANIFEST, ".lock"} | ({previous["file"]} if previous else set())
+        for entry in os.listdir(self.directory):
+            if entry.startswith("catalog-") and entry.split(".json")[0] + ".json" not in keep:
+                os.remove(os.path.join(self.directory, entry))
+        return manifest
+
+    def _write(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path + ".tmp", "wb") as handle:
+            handle.write(data)
+        os.replace(path + ".tmp", path)
+
+    @contextmanager
+    def _lock(self):
+        # Rebuilds read the previous snapshot, so they must not interleave.
+        with open(os.path.join(self.directory, ".lock"), "w") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _read_books(path):
+    """Yield the books of a snapshot file in order, reading it in chunks."""
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as handle:
+        buffer, position = handle.read(READ_CHUNK_SIZE), 1
+        while True:
+            if buffer.startswith(",", position):
+                position += 1
+            if buffer.startswith("]", position):
+                return
+            try:
+                book, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The next book runs past the buffer: keep its start, read on.
+                chunk = handle.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    raise
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            yield book
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+catalog_snapshot = CatalogSnapshot()
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+class MonitoredQueuePool(QueuePool):
+    """``QueuePool`` that also counts checkouts, time spent acquiring a
+    connection (queueing, pre-ping and connecting) and pool timeouts.
+
+    ``engine.dispose()`` (e.g. after a gunicorn fork) recreates the pool and
+    so starts the counters afresh for the new process.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.peak_checked_out = 0
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        waited = time.perf_counter() - started
+        with self._stats_lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self.peak_checked_out = max(self.peak_checked_out, self.checkedout())
+        return connection
+
+
+def engine_options(config):
+    """Build ``SQLALCHEMY_ENGINE_OPTIONS`` from the ``DB_*`` settings.
+
+    In PgBouncer mode PgBouncer owns the pooling, so each checkout opens a
+    fresh client connection (``NullPool``) and the statement timeout is set
+    per transaction, since startup options and session-level ``SET`` do not
+    survive transaction pooling. In-memory SQLite keeps Flask-SQLAlchemy's
+    single shared connection.
+    """
+    url = config.get("SQLALCHEMY_DATABASE_URI")
+    if not url:
+        return {}
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+
+    options = {"pool_pre_ping": config["DB_POOL_PRE_PING"]}
+    if config["DB_PGBOUNCER"]:
+        options["poolclass"] = NullPool
+        return options
+
+    options.update(
+        poolclass=MonitoredQueuePool,
+        pool_size=config["DB_POOL_SIZE"],
+        max_overflow=config["DB_MAX_OVERFLOW"],
+        pool_timeout=config["DB_POOL_TIMEOUT"],
+        pool_recycle=config["DB_POOL_RECYCLE"],
+    )
+    timeout = config["DB_STATEMENT_TIMEOUT_MS"]
+    if timeout and url.get_backend_name() == "postgresql":
+        options["connect_args"] = {"options": f"-c statement_timeout={int(timeout)}"}
+    return options
+
+
+def apply_statement_timeout(engine, config):
+    """In PgBouncer mode, run ``SET LOCAL statement_timeout`` in every transaction."""
+    timeout = config["DB_STATEMENT_TIMEOUT_MS"]
+    if not (timeout and config["DB_PGBOUNCER"] and engine.dialect.name == "postgresql"):
+        return
+
+    @event.listens_for(engine, "begin")
+    def set_local_timeout(conn):
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout)}")
+
+
+def pool_stats(engine):
+    """Live numbers for ``engine``'s pool in this process."""
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__, "pid": os.getpid()}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+        )
+    if isinstance(pool, MonitoredQueuePool):
+        with pool._stats_lock:
+            checkouts = pool.checkouts
+            stats.update(
+                checkouts=checkouts,
+                timeouts=pool.timeouts,
+                peak_checked_out=pool.peak_checked_out,
+                wait_avg_ms=round(pool.wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+                wait_max_ms=round(pool.wait_max * 1000, 3),
+            )
+    return stats
@@ -0,0 +1,185 @@
+import csv
+import io
+from datetime import datetime, timezone
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import or_, select
+
+from app import db
+from app.models import Book, User
+from app.utils.json_provider import isoformat
+from app.utils.loan_archive import LoanHistory
+
+CHUNK_SIZE = 5000
+FORMATS = ("csv", "parquet")
+
+
+class _Dataset:
+    def __init__(self, entity, columns, timestamps=()):
+        self.entity = entity
+        # (name, type) pairs; the type picks the CSV formatting and Parquet column type.
+        self.columns = columns
+        # A row changed at or after ``since`` when any of these is.
+        self.timestamps = timestamps
+
+    def statement(self, after, since):
+        entity = self.entity
+        stmt = select(*(getattr(entity, name) for name, _ in self.columns))
+        if after:
+            stmt = stmt.where(entity.id > after)
+        if since is not None:
+            stmt = stmt.where(or_(*(getattr(entity, name) >= since for name in self.timestamps)))
+        return stmt.order_by(entity.id)
+
+
+# Password hashes are never exported. Loans include archived history; a
+# loan is exported again by ``since`` once it is returned, but ``after``
+# only ever picks up new loans.
+DATASETS = {
+    "loans": _Dataset(LoanHistory, [
+        ("id", "int"), ("user_id", "int"), ("book_id", "int"),
+        ("loan_date", "datetime"), ("due_date", "datetime"), ("is_returned", "bool"),
+        ("returned_at", "datetime"),
+    ], timestamps=("loan_date", "returned_at")),
+    "books": _Dataset(Book, [
+        ("id", "int"), ("title", "str"), ("author", "str"),
+        ("total_copies", "int"), ("available_copies", "int"),
+    ]),
+    "users": _Dataset(User, [
+        ("id", "int"), ("username", "str"), ("email", "str"), ("is_admin", "bool"),
+    ]),
+}
+
+
+def parquet_supported():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return isoformat(value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+def _csv_chunks(columns, partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(name for name, _ in columns)
+    for rows in partitions:
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _Drain:
+    """Write-only file object whose contents are taken out as they arrive."""
+
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _parquet_chunks(columns, partitions):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"int": pa.int64(), "str": pa.string(), "bool": pa.bool_(), "datetime": pa.timestamp("us", tz="UTC")}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    drain = _Drain()
+    # One row group per chunk, so only a chunk is ever held in memory.
+    with pq.ParquetWriter(drain, schema) as writer:
+        for rows in partitions:
+            writer.write_table(pa.Table.from_pylist([row._asdict() for row in rows], schema=schema))
+            data = drain.take()
+            if data:
+                yield data
+    yield drain.take()
+
+
+def export_rows(dataset, fmt, after=0, since=None, chunk_size=CHUNK_SIZE):
+    """Return an iterator of ``dataset`` as CSV or Parquet bytes, in id order.
+
+    Rows are read through a server-side cursor (``stream_results``) and
+    encoded ``chunk_size`` at a time, so memory stays flat however large the
+    table is. ``after`` exports only ids above it, which never revisits a
+    row, and ``since`` only loans made or returned at or after it, for
+    incremental exports. Timestamps are UTC, ISO 8601 in CSV.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format {fmt!r}")
+    spec = DATASETS[dataset]
+    if since is not None and not spec.timestamps:
+        raise ValueError(f"{dataset} has no timestamp to filter on")
+    if since is not None and since.tzinfo is not None:
+        # Stored timestamps are naive UTC.
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    encode = _csv_chunks if fmt == "csv" else _parquet_chunks
+    return _stream(spec, encode, after, since, chunk_size)
+
+
+def _stream(spec, encode, after, since, chunk_size):
+    result = db.session.execute(
+        spec.statement(after, since),
+        execution_options={"stream_results": True, "yield_per": chunk_size}
+    )
+    try:
+        yield from encode(spec.columns, result.partitions())
+    finally:
+        result.close()
+
+
+@click.command("export")
+@click.argument("dataset", type=click.Choice(list(DATASETS)))
+@click.argument("path", type=click.Path(dir_okay=False, writable=True, allow_dash=True))
+@click.option("--format", "fmt", type=click.Choice(FORMATS), default=None,
+              help="Output format; guessed from the file extension by default.")
+@click.option("--after", type=int, default=0, help="Only export ids greater than this.")
+@click.option("--since", type=click.DateTime(), default=None,
+              help="Only export loans made or returned at or after this time (UTC).")
+@click.option("--chunk-size", type=int, default=CHUNK_SIZE, show_default=True)
+@with_appcontext
+def export_command(dataset, path, fmt, after, since, chunk_size):
+    """Export loans, books or users to a CSV or Parquet file (- for stdout)."""
+    if fmt is None:
+        fmt = "parquet" if path.endswith(".parquet") else "csv"
+    if fmt == "parquet" and not parquet_supported():
+        raise click.UsageError("Parquet export needs pyarrow installed")
+    if since is not None and not DATASETS[dataset].timestamps:
+        raise click.UsageError("--since only applies to loans")
+
+    with click.open_file(path, "wb") as stream:
+        for data in export_rows(dataset, fmt, after=after, since=since, chunk_size=chunk_size):
+            stream.write(data)
@@ -0,0 +1,301 @@
+import hmac
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.utils.json_provider import FastJSONProvider
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _RequestStats:
+    __slots__ = ("started", "statements", "db_time", "serialize_time", "by_statement")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.by_statement = Counter()
+
+
+def _current_stats():
+    if has_request_context():
+        return g.get("_request_stats")
+    return None
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats() is not None:
+        conn.info.setdefault("_query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    started = conn.info.get("_query_started")
+    if stats is None or not started:
+        return
+    stats.db_time += time.perf_counter() - started.pop()
+    stats.statements += 1
+    stats.by_statement[statement] += 1
+
+
+@event.listens_for(Engine, "handle_error")
+def _on_error(context):
+    # A failed statement never reaches after_cursor_execute, so drop its
+    # start time here or the next statement on the connection is mistimed.
+    started = context.connection.info.get("_query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+class TimedJSONProvider(FastJSONProvider):
+    """JSON provider that adds ``dumps`` time to the request's serialization time."""
+
+    def dumps(self, obj, **kwargs):
+        stats = _current_stats()
+        if stats is None:
+            return super().dumps(obj, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            stats.serialize_time += time.perf_counter() - started
+
+
+class _EndpointMetrics:
+    __slots__ = ("buckets", "duration_sum", "statements", "db_time", "serialize_time", "n_plus_one")
+
+    def __init__(self):
+        self.buckets = [0] * (len(DURATION_BUCKETS) + 1)
+        self.duration_sum = 0.0
+        self.statements = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.n_plus_one = 0
+
+
+class _MemoryStore:
+    def __init__(self):
+        self._requests = Counter()
+        self._endpoints = defaultdict(_EndpointMetrics)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, method, status, bucket, total, stats, n_plus_one):
+        with self._lock:
+            self._requests[(endpoint, method, status)] += 1
+            metrics = self._endpoints[endpoint]
+            metrics.buckets[bucket] += 1
+            metrics.duration_sum += total
+            metrics.statements += stats.statements
+            metrics.db_time += stats.db_time
+            metrics.serialize_time += stats.serialize_time
+            metrics.n_plus_one += n_plus_one
+
+    def snapshot(self):
+        with self._lock:
+            return (
+                dict(self._requests),
+                {name: _copy_metrics(metrics) for name, metrics in self._endpoints.items()},
+            )
+
+
+class _RedisStore:
+    """Totals kept in Redis hashes, so every worker adds to the same numbers."""
+
+    REQUESTS_KEY = "metrics:requests"
+    ENDPOINTS_KEY = "metrics:endpoints"
+
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def endpoint_key(endpoint):
+        return f"metrics:endpoint:{endpoint}"
+
+    def record(self, endpoint, method, status, bucket, total, stats, n_plus_one):
+        key = self.endpoint_key(endpoint)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hincrby(self.REQUESTS_KEY, f"{endpoint}|{method}|{status}", 1)
+        pipe.sadd(self.ENDPOINTS_KEY, endpoint)
+        pipe.hincrby(key, f"bucket:{bucket}", 1)
+        pipe.hincrbyfloat(key, "duration_sum", total)
+        pipe.hincrby(key, "statements", stats.statements)
+        pipe.hincrbyfloat(key, "db_time", stats.db_time)
+        pipe.hincrbyfloat(key, "serialize_time", stats.serialize_time)
+        if n_plus_one:
+            pipe.hincrby(key, "n_plus_one", 1)
+        pipe.execute()
+
+    def snapshot(self):
+        requests = {}
+        for field, count in self.client.hgetall(self.REQUESTS_KEY).items():
+            endpoint, method, status = field.decode().split("|")
+            requests[(endpoint, method, int(status))] = int(count)
+
+        names = sorted(name.decode() for name in self.client.smembers(self.ENDPOINTS_KEY))
+        pipe = self.client.pipeline(transaction=False)
+        for name in names:
+            pipe.hgetall(self.endpoint_key(name))
+        endpoints = {}
+        for name, fields in zip(names, pipe.execute()):
+            fields = {field.decode(): value for field, value in fields.items()}
+            metrics = _EndpointMetrics()
+            metrics.buckets = [int(fields.get(f"bucket:{i}", 0)) for i in range(len(metrics.buckets))]
+            metrics.duration_sum = float(fields.get("duration_sum", 0))
+            metrics.statements = int(fields.get("statements", 0))
+            metrics.db_time = float(fields.get("db_time", 0))
+            metrics.serialize_time = float(fields.get("serialize_time", 0))
+            metrics.n_plus_one = int(fields.get("n_plus_one", 0))
+            endpoints[name] = metrics
+        return requests, endpoints
+
+
+class RequestMetrics:
+    """Per-request SQL, serialization and total timings.
+
+    Every response gets a ``Server-Timing`` header. Requests that run the
+    same SQL statement more than ``METRICS_N_PLUS_ONE_THRESHOLD`` times are
+    logged and counted as N+1 suspects. Totals are kept per endpoint.
+
+    With ``METRICS_REDIS_URL`` set the totals live in Redis and cover every
+    gunicorn worker; otherwise each process keeps its own, which is only
+    meaningful with a single worker. ``/metrics`` serves them in the
+    Prometheus text format and is only registered when ``METRICS_TOKEN`` is
+    set; scrapers send it as a bearer token.
+    """
+
+    def __init__(self):
+        self.n_plus_one_threshold = 5
+        self.store = _MemoryStore()
+        self.token = None
+        self._errors = ()
+
+    def init_app(self, app):
+        if not app.config["METRICS_ENABLED"]:
+            return
+        self.n_plus_one_threshold = app.config["METRICS_N_PLUS_ONE_THRESHOLD"]
+        url = app.config.get("METRICS_REDIS_URL")
+        if url:
+            import redis
+            self.store = _RedisStore(redis.Redis.from_url(url, socket_timeout=0.25))
+            self._errors = (redis.RedisError,)
+        else:
+            if app.config["GUNICORN_WORKERS"] > 1:
+                logger.warning("METRICS_REDIS_URL is not set; /metrics only shows the worker "
+                               "that answers each scrape of %s", app.config["GUNICORN_WORKERS"])
+            self.store = _MemoryStore()
+            self._errors = ()
+        app.json = TimedJSONProvider(app)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        self.token = app.config.get("METRICS_TOKEN")
+        if self.token:
+            app.add_url_rule("/metrics", "metrics", self._metrics_view)
+        app.extensions["request_metrics"] = self
+
+    def _start(self):
+        g._request_stats = _RequestStats()
+
+    def _finish(self, response):
+        stats = g.pop("_request_stats", None)
+        if stats is None:
+            return response
+        total = time.perf_counter() - stats.started
+        endpoint = request.endpoint or "unmatched"
+
+        repeated = [
+            (statement, count) for statement, count in stats.by_statement.items()
+            if count > self.n_plus_one_threshold
+        ]
+        for statement, count in repeated:
+            logger.warning("Possible N+1 in %s: statement ran %d times: %s",
+                           endpoint, count, " ".join(statement.split())[:200])
+
+        timing = [
+            f'db;dur={stats.db_time * 1000:.2f};desc="{stats.statements} queries"',
+            f"serialize;dur={stats.serialize_time * 1000:.2f}",
+            f"total;dur={total * 1000:.2f}",
+        ]
+        if repeated:
+            timing.append(f'n_plus_one;desc="{max(count for _, count in repeated)} repeats"')
+        response.headers.add("Server-Timing", ", ".join(timing))
+
+        self._record(endpoint, request.method, response.status_code, total, stats, bool(repeated))
+        return response
+
+    def _record(self, endpoint, method, status, total, stats, n_plus_one):
+        bucket = next((i for i, bound in enumerate(DURATION_BUCKETS) if total <= bound), len(DURATION_BUCKETS))
+        # A metrics outage must not fail the request it is measuring.
+        try:
+            self.store.record(endpoint, method, status, bucket, total, stats, n_plus_one)
+        except self._errors:
+            logger.warning("Could not record request metrics", exc_info=True)
+
+    def render(self):
+        """The current totals in the Prometheus text exposition format."""
+        requests, endpoints = self.store.snapshot()
+        requests = sorted(requests.items())
+        endpoints = sorted(endpoints.items(), key=lambda item: item[0])
+
+        lines = [
+            "# HELP http_requests_total Requests served.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (endpoint, method, status), count in requests:
+            lines.append(f'http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+
+        lines += [
+            "# HELP http_request_duration_seconds Time from request start to response.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for endpoint, metrics in endpoints:
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS + ("+Inf",), metrics.buckets):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {metrics.duration_sum:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{endpoint="{endpoint}"}} {cumulative}')
+
+        for name, kind, help_text, attribute in (
+            ("http_request_sql_statements_total", "counter", "SQL statements executed.", "statements"),
+            ("http_request_db_seconds_total", "counter", "Time spent in SQL statements.", "db_time"),
+            ("http_request_serialize_seconds_total", "counter", "Time spent encoding JSON.", "serialize_time"),
+            ("http_request_n_plus_one_total", "counter", "Requests flagged as N+1 suspects.", "n_plus_one"),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for endpoint, metrics in endpoints:
+                value = getattr(metrics, attribute)
+                value = f"{value:.6f}" if isinstance(value, float) else value
+                lines.append(f'{name}{{endpoint="{endpoint}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def _metrics_view(self):
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), self.token.encode()):
+            return Response("Unauthorized\n", 401, {"WWW-Authenticate": "Bearer"}, mimetype="text/plain")
+        try:
+            body = self.render()
+        except self._errors:
+            return Response("Metrics store unavailable\n", 503, mimetype="text/plain")
+        return Response(body, mimetype="text/plain; version=0.0.4")
+
+
+def _copy_metrics(metrics):
+    copy = _EndpointMetrics()
+    for name in _EndpointMetrics.__slots__:
+        value = getattr(metrics, name)
+        setattr(copy, name, list(value) if isinstance(value, list) else value)
+    return copy
+
+
+request_metrics = RequestMetrics()
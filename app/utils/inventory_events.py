@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from sqlalchemy import select
+
+logger = logging.getLogger(__name__)
+
+
+class _Subscriber:
+    __slots__ = ("book_ids", "queue", "overflowed")
+
+    def __init__(self, book_ids, maxsize):
+        self.book_ids = book_ids
+        self.queue = queue.Queue(maxsize)
+        self.overflowed = False
+
+
+class InventoryEvents:
+    """Pushes ``available_copies`` changes to Server-Sent Events subscribers.
+
+    Writers call ``publish`` after commit with the book ids they touched.
+    With ``INVENTORY_EVENTS_REDIS_URL`` set, changes go through a Redis
+    pub/sub channel, so every worker process sees every write; without it
+    they only reach subscribers in the publishing process.
+
+    An idle subscriber is a blocked queue read, so holding thousands of them
+    needs a gevent worker (``GUNICORN_WORKER_CLASS=gevent``, the ``events``
+    service in docker-compose). Under gunicorn's thread and sync workers each
+    stream would hold a worker thread for good, so ``can_stream`` is false
+    there and the route refuses to stream.
+    """
+
+    CHANNEL = "inventory"
+
+    def __init__(self):
+        self.keepalive = 15
+        self.queue_size = 100
+        self._client = None
+        self._errors = ()
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._listener_pid = None
+        self.worker_class = None
+
+    def init_app(self, app):
+        self.keepalive = app.config["INVENTORY_EVENTS_KEEPALIVE"]
+        self.worker_class = app.config["GUNICORN_WORKER_CLASS"]
+        url = app.config.get("INVENTORY_EVENTS_REDIS_URL")
+        if url:
+            import redis
+            self._client = redis.Redis.from_url(url)
+            self._errors = (redis.RedisError,)
+        else:
+            self._client = None
+            self._errors = ()
+        app.extensions["inventory_events"] = self
+
+    @property
+    def can_stream(self):
+        # No worker class means the Flask development server.
+        return self.worker_class in (None, "gevent")
+
+    def publish(self, book_ids):
+        """Announce the current stock of ``book_ids``; missing ids are sent as deleted."""
+        book_ids = sorted(set(book_ids))
+        if not book_ids or (self._client is None and not self._subscribers):
+            return
+
+        from app import db
+        from app.models import Book
+        rows = db.session.execute(
+            select(Book.id, Book.available_copies, Book.total_copies).where(Book.id.in_(book_ids))
+        ).all()
+        changes = [
+            {"book_id": row.id, "available_copies": row.available_copies, "total_copies": row.total_copies}
+            for row in rows
+        ]
+        found = {row.id for row in rows}
+        changes += [{"book_id": book_id, "deleted": True} for book_id in book_ids if book_id not in found]
+
+        if self._client is not None:
+            try:
+                self._client.publish(self.CHANNEL, json.dumps(changes))
+                return
+            except self._errors as error:
+                logger.warning("Inventory event publish failed, delivering locally: %s", error)
+        self._dispatch(changes)
+
+    def stream(self, book_ids=None):
+        """Yield SSE frames for changes to ``book_ids`` (all books when ``None``)."""
+        subscriber = self._subscribe(book_ids)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                if subscriber.overflowed:
+                    # Too slow to keep up: make the client reconnect and refetch.
+                    yield "event: reset\ndata: {}\n\n"
+                    return
+                try:
+                    change = subscriber.queue.get(timeout=self.keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: inventory\ndata: {json.dumps(change)}\n\n"
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+    def _subscribe(self, book_ids):
+        subscriber = _Subscriber(frozenset(book_ids) if book_ids else None, self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        if self._client is not None:
+            self._ensure_listener()
+        return subscriber
+
+    def _dispatch(self, changes):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            for change in changes:
+                if subscriber.book_ids is not None and change["book_id"] not in subscriber.book_ids:
+                    continue
+                try:
+                    subscriber.queue.put_nowait(change)
+                except queue.Full:
+                    subscriber.overflowed = True
+                    break
+
+    def _ensure_listener(self):
+        # One Redis subscription per process, started on first use so that
+        # workers forked from a preloaded master each get their own.
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+        threading.Thread(target=self._listen, name="inventory-events", daemon=True).start()
+
+    def _listen(self):
+        delay = 1
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                delay = 1
+                for message in pubsub.listen():
+                    try:
+                        changes = json.loads(message["data"])
+                    except ValueError as error:
+                        logger.warning("Ignoring malformed inventory event: %s", error)
+                        continue
+                    self._dispatch(changes)
+            except self._errors as error:
+                logger.warning("Inventory event subscription lost, retrying in %ss: %s", delay, error)
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+
+
+inventory_events = InventoryEvents()
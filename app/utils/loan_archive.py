@@ -0,0 +1,124 @@
+import re
+from datetime import date, datetime
+
+from sqlalchemy import delete, insert, literal, select, text, union_all
+from sqlalchemy.orm import aliased
+
+from app.models import Loan, LoanArchive
+
+_COLUMNS = ("id", "user_id", "book_id", "loan_date", "due_date", "is_returned", "returned_at")
+
+# Monthly partitions of ``loans`` on Postgres are named loans_yYYYYmMM, with
+# loans_default catching dates outside every partition.
+_PARTITION_RE = re.compile(r"^loans_(y\d{4}m\d{2}|default)$")
+
+
+def _history_entity():
+    live = select(*(getattr(Loan, name) for name in _COLUMNS))
+    archived = select(*(getattr(LoanArchive, name) for name in _COLUMNS))
+    return aliased(Loan, union_all(live, archived).subquery("loan_history"), name="loan_history")
+
+
+# ``Loan`` over live and archived rows, for read-only history queries. Both
+# databases push filters on it down into each side of the UNION ALL, so the
+# usual indexes still apply.
+LoanHistory = _history_entity()
+
+
+def archive_batch(session, horizon, batch_size):
+    """Move up to ``batch_size`` returned loans made before ``horizon`` to
+    ``loans_archive``, lowest ids first. Returns the number moved.
+
+    Runs in the caller's transaction; commit after each batch to keep locks
+    short. Returned loans never change again, so no re-check is needed
+    between the copy and the delete.
+    """
+    loan_ids = session.scalars(
+        select(Loan.id)
+        .where(Loan.is_returned == True, Loan.loan_date < horizon)
+        .order_by(Loan.id)
+        .limit(batch_size)
+    ).all()
+    if not loan_ids:
+        return 0
+
+    session.execute(insert(LoanArchive).from_select(
+        list(_COLUMNS) + ["archived_at"],
+        select(*(getattr(Loan, name) for name in _COLUMNS), literal(datetime.utcnow()))
+        .where(Loan.id.in_(loan_ids))
+    ))
+    session.execute(
+        delete(Loan).where(Loan.id.in_(loan_ids)).execution_options(synchronize_session=False)
+    )
+    return len(loan_ids)
+
+
+def partition_name(month):
+    return f"loans_y{month.year:04d}m{month.month:02d}"
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def ensure_loan_partitions(connection, months_ahead):
+    """Create the monthly ``loans`` partitions up to ``months_ahead`` months
+    from now. Returns the names created; a no-op unless ``loans`` is a
+    partitioned Postgres table.
+
+    Rows that already landed in loans_default for a new month are moved into
+    the new partition, since Postgres refuses to add a partition whose range
+    the default partition holds rows for.
+    """
+    if connection.dialect.name != "postgresql":
+        return []
+    partitioned = connection.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = 'loans' AND pg_table_is_visible(c.oid)"
+    )).scalar()
+    if not partitioned:
+        return []
+
+    existing = set(connection.scalars(text(
+        "SELECT child.relname FROM pg_inherits i "
+        "JOIN pg_class child ON child.oid = i.inhrelid "
+        "JOIN pg_class parent ON parent.oid = i.inhparent "
+        "WHERE parent.relname = 'loans' AND pg_table_is_visible(parent.oid)"
+    )))
+
+    created = []
+    first = date.today().replace(day=1)
+    for offset in range(months_ahead + 1):
+        start = _add_months(first, offset)
+        end = _add_months(start, 1)
+        name = partition_name(start)
+        if name in existing:
+            continue
+
+        bounds = {"start": start, "end": end}
+        stranded = "loans_default" in existing and connection.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM loans_default WHERE loan_date >= :start AND loan_date < :end)"
+        ), bounds).scalar()
+        if stranded:
+            connection.execute(text(f"CREATE TABLE {name} (LIKE loans INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+            connection.execute(text(
+                f"WITH moved AS (DELETE FROM loans_default WHERE loan_date >= :start AND loan_date < :end "
+                f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+            ), bounds)
+            connection.execute(text(
+                f"ALTER TABLE loans ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"
+            ))
+        else:
+            connection.execute(text(
+                f"CREATE TABLE {name} PARTITION OF loans FOR VALUES FROM ('{start}') TO ('{end}')"
+            ))
+        created.append(name)
+    return created
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Alembic autogenerate filter that ignores the ``loans`` partitions."""
+    if reflected and compare_to is None and type_ == "table":
+        return not _PARTITION_RE.match(name or "")
+    return True
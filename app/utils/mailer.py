@@ -0,0 +1,209 @@
+import logging
+import os
+import queue
+import random
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+
+logger = logging.getLogger(__name__)
+
+_TRANSIENT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError)
+
+
+class RateLimiter:
+    """Token bucket shared by all sending threads; ``rate`` 0 disables it.
+
+    The bucket holds at least one token, so rates below one per second
+    (e.g. 0.5) still let a message through every ``1 / rate`` seconds.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = max(float(rate), 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class _Connection:
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+class Mailer:
+    """SMTP sender that keeps a pool of authenticated connections open.
+
+    Each connection carries up to ``max_per_connection`` messages before it
+    is recycled, so a nightly run pays for connect/EHLO/STARTTLS/AUTH once per
+    connection rather than once per message. Transient failures (dropped
+    connections, 4xx replies) are retried with exponential backoff on a fresh
+    connection; 5xx replies fail the message immediately.
+    """
+
+    def __init__(self):
+        self.host = "localhost"
+        self.port = 25
+        self.username = None
+        self.password = None
+        self.use_tls = False
+        self.sender = None
+        self.pool_size = 2
+        self.max_per_connection = 100
+        self.idle_timeout = 30
+        self.max_retries = 3
+        self.backoff = 0.5
+        self.timeout = 10
+        self.limiter = RateLimiter(0)
+        self._pool = queue.LifoQueue()
+        self._pool_pid = None
+
+    def init_app(self, app):
+        config = app.config
+        self.configure(
+            host=config["MAIL_SERVER"],
+            port=config["MAIL_PORT"],
+            username=config["MAIL_USERNAME"],
+            password=config["MAIL_PASSWORD"],
+            use_tls=config["MAIL_USE_TLS"],
+            sender=config["MAIL_DEFAULT_SENDER"],
+            pool_size=config["MAIL_POOL_SIZE"],
+            max_per_connection=config["MAIL_MAX_PER_CONNECTION"],
+            rate=config["MAIL_RATE_LIMIT"],
+            max_retries=config["MAIL_MAX_RETRIES"],
+        )
+        app.extensions["mailer"] = self
+
+    def configure(self, rate=None, **settings):
+        for name, value in settings.items():
+            setattr(self, name, value)
+        if rate is not None:
+            self.limiter = RateLimiter(rate)
+        self.close()
+
+    def message(self, to, subject, body):
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = to
+        message["Subject"] = subject
+        message.set_content(body)
+        return message
+
+    def send(self, message):
+        """Send one message, retrying transient failures. Raises on give-up."""
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            connection = None
+            try:
+                connection = self._checkout()
+                connection.smtp.send_message(message)
+            except smtplib.SMTPRecipientsRefused:
+                self._checkin(connection)
+                raise
+            except smtplib.SMTPResponseException as error:
+                self._discard(connection)
+                if error.smtp_code >= 500 or attempt == self.max_retries:
+                    raise
+            except _TRANSIENT_ERRORS:
+                self._discard(connection)
+                if attempt == self.max_retries:
+                    raise
+            else:
+                connection.sent += 1
+                self._checkin(connection)
+                return
+            time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    def send_many(self, messages):
+        """Send ``messages`` over up to ``pool_size`` connections in parallel.
+
+        Returns ``(sent, failures)`` where ``failures`` lists
+        ``(message, error)`` pairs.
+        """
+        failures = []
+
+        def deliver(message):
+            try:
+                self.send(message)
+                return True
+            except (smtplib.SMTPException, OSError) as error:
+                logger.warning("Giving up on mail to %s: %s", message["To"], error)
+                failures.append((message, error))
+                return False
+
+        with ThreadPoolExecutor(max_workers=self.pool_size) as pool:
+            sent = sum(pool.map(deliver, messages))
+        return sent, failures
+
+    def close(self):
+        while True:
+            try:
+                connection = self._pool.get_nowait()
+            except queue.Empty:
+                return
+            self._quit(connection)
+
+    def _checkout(self):
+        if self._pool_pid != os.getpid():
+            # Sockets inherited across fork belong to the parent.
+            self._pool = queue.LifoQueue()
+            self._pool_pid = os.getpid()
+
+        while True:
+            try:
+                connection = self._pool.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - connection.last_used < self.idle_timeout:
+                return connection
+            self._quit(connection)
+
+    def _checkin(self, connection):
+        if connection.sent >= self.max_per_connection or self._pool.qsize() >= self.pool_size:
+            self._quit(connection)
+            return
+        connection.last_used = time.monotonic()
+        self._pool.put(connection)
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            smtp.starttls()
+        if self.username:
+            smtp.login(self.username, self.password)
+        return _Connection(smtp)
+
+    def _discard(self, connection):
+        if connection is None:
+            return
+        try:
+            connection.smtp.close()
+        except OSError:
+            pass
+
+    def _quit(self, connection):
+        try:
+            connection.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.smtp.close()
+
+
+mailer = Mailer()
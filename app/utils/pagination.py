@@ -0,0 +1,41 @@
+from flask import request
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def parse_keyset_args():
+    """Read ``limit`` and ``after`` from the query string.
+
+    Returns ``(limit, after, error)``; ``error`` is a message when one of
+    the arguments is not a valid non-negative integer.
+    """
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+        after = int(request.args.get("after", 0))
+    except ValueError:
+        return None, None, "limit and after must be integers"
+
+    if limit <= 0 or after < 0:
+        return None, None, "limit must be positive and after non-negative"
+
+    return min(limit, MAX_PAGE_SIZE), after, None
+
+
+def keyset_page(query, key_column, after, limit):
+    """Fetch one page of ``query`` ordered by ``key_column`` after ``after``.
+
+    Returns ``(rows, next_after)``; ``next_after`` is ``None`` on the last page.
+    One extra row is read to know whether another page exists, so no
+    ``COUNT(*)`` or ``OFFSET`` scan is needed.
+    """
+    rows = (
+        query.filter(key_column > after)
+        .order_by(key_column)
+        .limit(limit + 1)
+        .all()
+    )
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, getattr(rows[-1], key_column.key)
+    return rows, None
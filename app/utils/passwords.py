@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from flask import jsonify
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing queue is full; served as 503."""
+
+
+class PasswordHasher:
+    """Runs password hashing on a bounded process pool.
+
+    Hashing is deliberately CPU expensive, so it is kept off the request
+    thread's interpreter. At most ``queue_limit`` hashes may be queued or
+    running per process; beyond that ``HasherBusy`` is raised instead of
+    letting logins pile up and starve other requests. With
+    ``PASSWORD_HASH_WORKERS = 0`` hashing runs inline.
+
+    The pool is per gunicorn worker, so a host runs ``GUNICORN_WORKERS x
+    PASSWORD_HASH_WORKERS`` hashing processes, hence the default of one.
+    Pool processes come from a forkserver: forking a threaded worker can
+    copy a lock some other thread holds and deadlock the child.
+
+    Under gevent workers a blocking wait on the pool would stall every
+    greenlet in the process, so hashing runs on the gevent hub's thread
+    pool instead and only the waiting greenlet yields.
+    """
+
+    def __init__(self):
+        self.method = "scrypt:32768:8:1"
+        self.workers = 0
+        self.timeout = 10
+        self._slots = None
+        self._gevent = False
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.method = app.config["PASSWORD_HASH_METHOD"]
+        self.workers = app.config["PASSWORD_HASH_WORKERS"]
+        self.timeout = app.config["PASSWORD_HASH_TIMEOUT"]
+        self._gevent = app.config["GUNICORN_WORKER_CLASS"] == "gevent"
+        queue_limit = app.config["PASSWORD_HASH_QUEUE_LIMIT"] or max(self.workers, 1) * 4
+        self._slots = threading.BoundedSemaphore(queue_limit)
+        app.extensions["password_hasher"] = self
+        app.register_error_handler(HasherBusy, _busy_response)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True when ``password_hash`` was made with other method or cost settings."""
+        return _normalize_method(password_hash.split("$", 1)[0]) != _normalize_method(self.method)
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        if self._gevent:
+            return self._run_on_hub(func, *args)
+        if not self.workers:
+            try:
+                return func(*args)
+            finally:
+                self._slots.release()
+
+        try:
+            future = self._executor().submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot stays taken until the hash has really left the pool, so
+        # timed-out work still counts against the queue limit.
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise HasherBusy()
+
+    def _run_on_hub(self, func, *args):
+        from gevent import Timeout, get_hub
+        try:
+            result = get_hub().threadpool.spawn(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        result.rawlink(lambda _: self._slots.release())
+        try:
+            return result.get(timeout=self.timeout)
+        except Timeout:
+            raise HasherBusy()
+
+    def _executor(self):
+        # Pools do not survive fork, so a worker forked from a preloaded
+        # master builds its own on first use.
+        with self._pool_lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("forkserver"))
+                self._pool_pid = os.getpid()
+            return self._pool
+
+
+def _normalize_method(method):
+    """Spell out the defaults werkzeug fills in, e.g. ``pbkdf2:sha256`` -> ``pbkdf2:sha256:1000000``."""
+    name, *args = method.split(":")
+    if name == "scrypt" and not args:
+        args = ["32768", "8", "1"]
+    elif name == "pbkdf2":
+        args = (args or ["sha256"]) + ([str(DEFAULT_PBKDF2_ITERATIONS)] if len(args) < 2 else [])
+    return (name, *args)
+
+
+def _busy_response(error):
+    response = jsonify({"msg": "Server busy, please retry"})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,73 @@
+import random
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.models import LoanDailyStat, BookLoanStat
+
+DAILY_SHARDS = 8
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def upsert_counters(session, model, keys, rows, counters):
+    """Insert ``rows`` into ``model``, adding their ``counters`` to rows that
+    already exist with the same ``keys``."""
+    if not rows:
+        return
+    dialect = session.get_bind().dialect.name
+    if dialect not in _INSERTS:
+        raise RuntimeError(
+            f"Circulation rollups need INSERT ... ON CONFLICT, which the {dialect} dialect "
+            f"does not provide; use PostgreSQL or SQLite"
+        )
+    insert = _INSERTS[dialect]
+    statement = insert(model).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=keys,
+        set_={
+            name: getattr(model, name) + getattr(statement.excluded, name)
+            for name in counters
+        }
+    )
+    session.execute(statement)
+
+
+def record_checkouts(session, loans):
+    """Add checkouts to the rollups; ``loans`` is an iterable of ``(book_id, loan_date)``.
+
+    Runs inside the caller's transaction, so the rollups commit or roll back
+    together with the loans themselves.
+    """
+    by_book, by_day = Counter(), Counter()
+    for book_id, loan_date in loans:
+        by_book[book_id] += 1
+        by_day[loan_date.date()] += 1
+
+    shard = random.randrange(DAILY_SHARDS)
+    upsert_counters(session, LoanDailyStat, ["day", "shard"], [
+        {"day": day, "shard": shard, "loans_created": count, "loans_returned": 0}
+        for day, count in sorted(by_day.items())
+    ], ["loans_created"])
+    upsert_counters(session, BookLoanStat, ["book_id"], [
+        {"book_id": book_id, "total_loans": count, "active_loans": count}
+        for book_id, count in sorted(by_book.items())
+    ], ["total_loans", "active_loans"])
+
+
+def record_returns(session, by_book):
+    """Add returns to the rollups; ``by_book`` maps book id to returned loans."""
+    if not by_book:
+        return
+
+    upsert_counters(session, LoanDailyStat, ["day", "shard"], [{
+        "day": datetime.utcnow().date(),
+        "shard": random.randrange(DAILY_SHARDS),
+        "loans_created": 0,
+        "loans_returned": sum(by_book.values()),
+    }], ["loans_returned"])
+    upsert_counters(session, BookLoanStat, ["book_id"], [
+        {"book_id": book_id, "total_loans": 0, "active_loans": -count}
+        for book_id, count in sorted(by_book.items())
+    ], ["active_loans"])
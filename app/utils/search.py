@@ -0,0 +1,121 @@
+import re
+from sqlalchemy import DDL, and_, column, event, func, or_, select, table, text
+
+# Postgres: a generated tsvector column (kept current by the database on every
+# write) with a GIN index, plus trigram indexes for typo tolerant matching.
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(author, '')), 'B')"
+    ") STORED",
+    "CREATE INDEX IF NOT EXISTS ix_books_search_vector ON books USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_books_title_trgm ON books USING gin (title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_books_author_trgm ON books USING gin (author gin_trgm_ops)",
+]
+
+# SQLite: an external content FTS5 table synced by triggers.
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5("
+    "title, author, content='books', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN "
+    "INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author); END",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author); END",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author); "
+    "INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author); END",
+]
+
+_POSTGRES_QUERY = text("""
+    SELECT id, title, author, total_copies, available_copies
+    FROM books, websearch_to_tsquery('simple', :q) AS query
+    WHERE search_vector @@ query OR title % :q OR author % :q
+    ORDER BY ts_rank(search_vector, query) + greatest(similarity(title, :q), similarity(author, :q)) DESC, id
+    LIMIT :limit
+""")
+
+_SQLITE_QUERY = text("""
+    SELECT books.id, books.title, books.author, books.total_copies, books.available_copies
+    FROM books_fts JOIN books ON books.id = books_fts.rowid
+    WHERE books_fts MATCH :q
+    ORDER BY bm25(books_fts), books.id
+    LIMIT :limit
+""")
+
+_BOOKS = table(
+    "books", column("id"), column("title"), column("author"), column("total_copies"), column("available_copies")
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_SEARCH_OBJECT_NAMES = {
+    "search_vector", "ix_books_search_vector", "ix_books_title_trgm", "ix_books_author_trgm"
+}
+
+
+def register_search_ddl(table):
+    """Create the search index objects whenever ``table`` is created."""
+    for statement in POSTGRES_SEARCH_DDL:
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+    for statement in SQLITE_SEARCH_DDL:
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Alembic autogenerate filter that ignores the search index objects.
+
+    They are managed by raw DDL, so autogenerate must not try to drop them.
+    """
+    if reflected and compare_to is None:
+        if name in _SEARCH_OBJECT_NAMES or (name or "").startswith("books_fts"):
+            return False
+    return True
+
+
+def _fts5_query(q):
+    # Every word must match, the last one as a prefix so partially typed
+    # words still hit. Quoting keeps FTS5 operators in user input inert.
+    tokens = _TOKEN_RE.findall(q)
+    if not tokens:
+        return None
+    terms = ['"%s"' % token for token in tokens[:-1]]
+    terms.append('"%s"*' % tokens[-1])
+    return " ".join(terms)
+
+
+def _fallback_query(q, limit):
+    # Other databases: every word must appear in the title or author,
+    # without ranking or typo tolerance.
+    tokens = _TOKEN_RE.findall(q)
+    if not tokens:
+        return None
+    return (
+        select(_BOOKS)
+        .where(and_(*(
+            or_(
+                func.lower(_BOOKS.c.title).contains(token.lower(), autoescape=True),
+                func.lower(_BOOKS.c.author).contains(token.lower(), autoescape=True)
+            )
+            for token in tokens
+        )))
+        .order_by(_BOOKS.c.id)
+        .limit(limit)
+    )
+
+
+def search_books(session, q, limit):
+    """Return ranked book rows whose title or author match ``q``."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return session.execute(_POSTGRES_QUERY, {"q": q, "limit": limit}).all()
+    if dialect == "sqlite":
+        match = _fts5_query(q)
+        if match is None:
+            return []
+        return session.execute(_SQLITE_QUERY, {"q": match, "limit": limit}).all()
+    query = _fallback_query(q, limit)
+    if query is None:
+        return []
+    return session.execute(query).all()
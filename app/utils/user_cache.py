@@ -0,0 +1,222 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class UserIdentity:
+    """The columns authenticated routes read from ``current_user``."""
+    id: int
+    username: str
+    email: str
+    is_admin: bool
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(id=user.id, username=user.username, email=user.email, is_admin=bool(user.is_admin))
+
+
+class UserCache:
+    """Per-process TTL/LRU cache of user identities, optionally backed by Redis.
+
+    Lookups try the local LRU first, then Redis (when configured), then call
+    the loader. ``invalidate`` must be called whenever a user row changes.
+
+    With ``USER_CACHE_REDIS_URL`` set, invalidations are also published on a
+    Redis channel that every process listens to, so a deleted or demoted user
+    drops out of all local LRUs at once. Without it, or while that
+    subscription is down, other processes keep serving the old identity,
+    ``is_admin`` included, for up to ``USER_CACHE_TTL`` seconds.
+
+    A lookup may read the user row just before a change commits and finish
+    after its invalidation. Every invalidation bumps a generation number (one
+    per process, one per user in Redis); a load only stores its result if
+    the generation it started with is still current, so such a stale read
+    is served once but never cached.
+    """
+
+    CHANNEL = "user-invalidations"
+
+    def __init__(self):
+        self.maxsize = 10000
+        self.ttl = 30
+        self.redis = None
+        self._subscriber = None
+        self._redis_errors = ()
+        self.key_prefix = "user:"
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._listener_pid = None
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.maxsize = app.config["USER_CACHE_SIZE"]
+        self.ttl = app.config["USER_CACHE_TTL"]
+        url = app.config.get("USER_CACHE_REDIS_URL")
+        if url:
+            import redis
+            self.redis = redis.Redis.from_url(url, socket_timeout=0.25)
+            # The subscription idles between messages, so it cannot share the short timeout.
+            self._subscriber = redis.Redis.from_url(url, health_check_interval=30)
+            self._redis_errors = (redis.RedisError, ValueError)
+        else:
+            self.redis = self._subscriber = None
+            self._redis_errors = ()
+        self.clear()
+        app.extensions["user_cache"] = self
+
+    def get(self, user_id, loader):
+        user_id = int(user_id)
+        now = time.monotonic()
+        if self.redis is not None:
+            self._ensure_listener()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            generation = self._generation
+
+        identity, redis_generation = self._redis_get(user_id)
+        if identity is not None:
+            with self._lock:
+                self.redis_hits += 1
+        else:
+            user = loader(user_id)
+            with self._lock:
+                self.misses += 1
+            if user is None:
+                return None
+            identity = UserIdentity.from_user(user)
+            self._redis_set(identity, redis_generation)
+
+        self._store(identity, now, generation)
+        return identity
+
+    def invalidate(self, user_id):
+        user_id = int(user_id)
+        self._forget(user_id)
+        if self.redis is not None:
+            key = self.key_prefix + str(user_id)
+            try:
+                pipe = self.redis.pipeline()
+                pipe.incr(key + ":generation")
+                # Outlives every entry stored under the previous generation.
+                pipe.expire(key + ":generation", self.ttl * 2)
+                pipe.delete(key)
+                pipe.publish(self.CHANNEL, str(user_id))
+                pipe.execute()
+            except self._redis_errors as error:
+                logger.warning("User cache invalidation for %s not published: %s", user_id, error)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.redis_hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "redis": self.redis is not None,
+            }
+
+    def _forget(self, user_id):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(user_id, None)
+
+    def _store(self, identity, now, generation):
+        with self._lock:
+            if generation != self._generation:
+                # Invalidated while loading: the identity may predate the change.
+                return
+            self._entries[identity.id] = (now + self.ttl, identity)
+            self._entries.move_to_end(identity.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    # Redis is an optimisation only: any error there falls through to the
+    # database instead of failing the request.
+    # Returns ``(identity, generation)``; entries stored under an older
+    # generation than the user's current one are misses.
+    def _redis_get(self, user_id):
+        if self.redis is None:
+            return None, None
+        key = self.key_prefix + str(user_id)
+        try:
+            raw, generation = self.redis.mget(key, key + ":generation")
+            generation = int(generation or 0)
+            if not raw:
+                return None, generation
+            fields = json.loads(raw)
+        except self._redis_errors:
+            return None, None
+        if fields.pop("generation", None) != generation:
+            return None, generation
+        return UserIdentity(**fields), generation
+
+    def _redis_set(self, identity, generation):
+        if self.redis is None or generation is None:
+            return
+        try:
+            self.redis.setex(
+                self.key_prefix + str(identity.id), self.ttl,
+                json.dumps(dict(asdict(identity), generation=generation))
+            )
+        except self._redis_errors:
+            pass
+
+
+    def _ensure_listener(self):
+        # One subscription per process, started on first use so that workers
+        # forked from a preloaded master each get their own.
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+        threading.Thread(target=self._listen, name="user-cache-invalidations", daemon=True).start()
+
+    def _listen(self):
+        delay = 1
+        while True:
+            try:
+                pubsub = self._subscriber.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                delay = 1
+                # Entries cached before the subscription (re)connected may
+                # have missed an invalidation.
+                self._clear_entries()
+                for message in pubsub.listen():
+                    try:
+                        user_id = int(message["data"])
+                    except ValueError:
+                        continue
+                    self._forget(user_id)
+            except self._redis_errors as error:
+                logger.warning("User cache subscription lost, retrying in %ss: %s", delay, error)
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    def _clear_entries(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+user_cache = UserCache()
@@ -0,0 +1,118 @@
+import random
+from functools import wraps
+
+from flask import request, make_response
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+TRACKED_TABLES = ("books", "loans")
+
+# Each counter is split over shard rows, like the circulation rollups: a
+# transaction bumps one shard at random and readers sum them, so concurrent
+# writers rarely wait on the same row lock.
+COUNTER_SHARDS = 8
+
+# Deleting a book or a user cascades to its loans.
+_CASCADES = {"books": {"loans"}, "users": {"loans"}}
+
+
+def register_counter_seed(table):
+    """Insert a zero counter shard for every tracked table when ``table`` is created."""
+    @event.listens_for(table, "after_create")
+    def seed(target, connection, **kw):
+        connection.execute(target.insert(), [{"name": name, "shard": 0, "version": 0} for name in TRACKED_TABLES])
+
+
+def mark_changed(session, *tables):
+    """Record that the current transaction wrote to ``tables``.
+
+    Writes through the ORM or ``session.execute`` are picked up automatically;
+    only raw DBAPI writes need to call this.
+    """
+    tracked = [table for table in tables if table in TRACKED_TABLES]
+    if tracked:
+        session.info.setdefault("changed_tables", set()).update(tracked)
+
+
+def _mark(session, table, deleted):
+    mark_changed(session, table, *(_CASCADES.get(table, ()) if deleted else ()))
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    for objects, deleted in ((session.new, False), (session.dirty, False), (session.deleted, True)):
+        for obj in objects:
+            table = getattr(obj, "__tablename__", None)
+            if table is not None:
+                _mark(session, table, deleted)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            _mark(orm_execute_state.session, table.name, orm_execute_state.is_delete)
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_counters(session):
+    # Flush first so pending ORM changes are tracked, then bump as late as
+    # possible. The bump commits with the data, so a version is never seen
+    # before the rows it counts; the shard row stays locked until the COMMIT.
+    session.flush()
+    changed = session.info.pop("changed_tables", None)
+    if not changed:
+        return
+
+    from app.models import ChangeCounter
+    from app.utils.rollups import upsert_counters
+    shard = random.randrange(COUNTER_SHARDS)
+    upsert_counters(session, ChangeCounter, ["name", "shard"], [
+        {"name": name, "shard": shard, "version": 1} for name in sorted(changed)
+    ], ["version"])
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_changes(session, previous_transaction):
+    session.info.pop("changed_tables", None)
+
+
+def current_version(session, table):
+    from app.models import ChangeCounter
+    version = session.execute(
+        select(func.sum(ChangeCounter.version)).where(ChangeCounter.name == table)
+    ).scalar()
+    return version or 0
+
+
+def request_version(table):
+    """``current_version`` of ``table``, read once per request."""
+    from app import db
+    versions = request.environ.setdefault("app.change_versions", {})
+    if table not in versions:
+        versions[table] = current_version(db.session, table)
+    return versions[table]
+
+
+def conditional_on(table):
+    """Answer ``If-None-Match`` for a view whose output depends only on ``table``.
+
+    The ETag is the table's change counter, so an unchanged resource returns
+    ``304 Not Modified`` before any rows are loaded or serialized.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = f"{table}-{request_version(table)}"
+            if request.if_none_match.contains(etag):
+                response = make_response("", 304)
+                response.set_etag(etag)
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
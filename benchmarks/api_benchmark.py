@@ -0,0 +1,247 @@
+"""Drive a realistic request mix and compare latency against stored baselines.
+
+    python benchmarks/api_benchmark.py --users 200 --books 5000 --loans 2000 --requests 5000
+    python benchmarks/api_benchmark.py --save-baseline      # record this machine's numbers
+    python benchmarks/api_benchmark.py --tolerance 0.25     # exit 1 on >25% regressions
+
+Seeds users, books and loans, then sends a weighted mix of /login, /books,
+/books/<id>, /loans/creat, /loan/<id> and /loans/active through the app's
+test client from --concurrency threads (no network in the way, so the
+numbers track the application itself). Reports p50/p95/p99 and requests
+per second per endpoint.
+
+DATABASE_URL defaults to a temporary SQLite file; point it at a scratch
+Postgres database to benchmark Postgres. The schema is recreated.
+Baselines are machine specific: record them on the machine that runs the
+comparison.
+"""
+import argparse
+import json
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "api_benchmark.json")
+PASSWORD = "benchmark-password"
+
+DEFAULT_MIX = {
+    "login": 5,
+    "list_books": 25,
+    "get_book": 35,
+    "create_loan": 10,
+    "deliver_loan": 10,
+    "active_loans": 15,
+}
+
+
+def seed(db, args):
+    from sqlalchemy import insert
+    from app.models import User, Book, Loan
+    from app.utils.passwords import password_hasher
+
+    db.drop_all()
+    db.create_all()
+    password_hash = password_hasher.hash(PASSWORD)
+    db.session.execute(insert(User), [
+        {"username": f"user{i}", "email": f"user{i}@example.com", "password_hash": password_hash,
+         "is_admin": i == 0}
+        for i in range(args.users)
+    ])
+    # Plenty of copies so checkouts measure the write path, not rejections.
+    copies = args.loans + args.requests
+    db.session.execute(insert(Book), [
+        {"title": f"Benchmark Book {i}", "author": f"Author {i % 997}",
+         "total_copies": copies, "available_copies": copies}
+        for i in range(args.books)
+    ])
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    db.session.execute(insert(Loan), [
+        {"user_id": rng.randint(1, args.users), "book_id": rng.randint(1, args.books),
+         "loan_date": now - timedelta(days=rng.randint(0, 60)),
+         "due_date": now + timedelta(days=rng.randint(-30, 30)), "is_returned": False}
+        for _ in range(args.loans)
+    ])
+    db.session.commit()
+
+
+class Workload:
+    def __init__(self, app, args):
+        self.app = app
+        self.args = args
+        self.open_loans = queue.SimpleQueue()
+        for loan_id in range(1, args.loans + 1):
+            self.open_loans.put(loan_id)
+        with app.test_client() as client:
+            token = client.post("/login", json={"username": "user0", "password": PASSWORD}).get_json()["user_token"]
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    def run(self, client, name, rng):
+        args = self.args
+        if name == "login":
+            return client.post("/login", json={"username": f"user{rng.randrange(args.users)}", "password": PASSWORD})
+        if name == "list_books":
+            after = rng.randrange(max(args.books - 50, 1))
+            return client.get(f"/books?limit=50&after={after}", headers=self.headers)
+        if name == "get_book":
+            return client.get(f"/books/{rng.randint(1, args.books)}", headers=self.headers)
+        if name == "create_loan":
+            return client.post("/loans/creat", headers=self.headers, data={
+                "user_id": rng.randint(1, args.users),
+                "book_id": rng.randint(1, args.books),
+            })
+        if name == "deliver_loan":
+            try:
+                loan_id = self.open_loans.get_nowait()
+            except queue.Empty:
+                return None
+            return client.post(f"/loan/{loan_id}", headers=self.headers)
+        if name == "active_loans":
+            return client.get("/loans/active?limit=50", headers=self.headers)
+        raise ValueError(name)
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def drive(workload, mix, requests, concurrency, seed_value):
+    names, weights = zip(*mix.items())
+    timings = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+
+    def client_loop(index):
+        rng = random.Random(seed_value + index)
+        local = defaultdict(list)
+        local_errors = defaultdict(int)
+        with workload.app.test_client() as client:
+            for _ in range(requests // concurrency):
+                name = rng.choices(names, weights)[0]
+                started = time.perf_counter()
+                response = workload.run(client, name, rng)
+                if response is None:
+                    continue
+                local[name].append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    local_errors[name] += 1
+        with lock:
+            for name, values in local.items():
+                timings[name].extend(values)
+            for name, count in local_errors.items():
+                errors[name] += count
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client_loop, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    for name in names:
+        values = sorted(timings[name])
+        if not values:
+            continue
+        results[name] = {
+            "count": len(values),
+            "errors": errors[name],
+            "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+            "rps": round(len(values) / elapsed, 1),
+        }
+    return results, elapsed
+
+
+def compare(results, baseline, tolerance):
+    """Return one message per endpoint whose p95 or throughput regressed."""
+    regressions = []
+    for name, base in baseline.get("endpoints", {}).items():
+        current = results.get(name)
+        if current is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']} ms vs baseline {base['p95_ms']} ms")
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {current['rps']} req/s vs baseline {base['rps']} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--books", type=int, default=5000)
+    parser.add_argument("--loans", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=5000, help="Total requests across all clients")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel clients")
+    parser.add_argument("--mix", nargs="+", metavar="ENDPOINT=WEIGHT",
+                        help=f"Override weights, endpoints: {', '.join(DEFAULT_MIX)}")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Write results to --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    mix = dict(DEFAULT_MIX)
+    for item in args.mix or ():
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_MIX:
+            parser.error(f"unknown endpoint {name}")
+        mix[name] = float(weight)
+    mix = {name: weight for name, weight in mix.items() if weight > 0}
+
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(), "api_bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-of-sufficient-length")
+    os.environ.setdefault("API_DOCS_ENABLED", "0")
+
+    from app import create_app, db
+
+    app = create_app()
+    with app.app_context():
+        seed(db, args)
+    workload = Workload(app, args)
+    results, elapsed = drive(workload, mix, args.requests, args.concurrency, args.seed)
+
+    print(f"{'endpoint':<14} {'count':>6} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    for name, row in results.items():
+        print(f"{name:<14} {row['count']:>6} {row['errors']:>6} {row['p50_ms']:>8.2f} "
+              f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['rps']:>8.1f}")
+    total = sum(row["count"] for row in results.values())
+    print(f"{total} requests in {elapsed:.2f}s ({total / elapsed:.1f} req/s)")
+
+    dataset = {"users": args.users, "books": args.books, "loans": args.loans, "requests": args.requests,
+               "concurrency": args.concurrency, "mix": mix}
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as handle:
+            json.dump({"dataset": dataset, "endpoints": results}, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against; run with --save-baseline first.")
+        return
+    with open(args.baseline) as handle:
+        baseline = json.load(handle)
+    if baseline.get("dataset") != dataset:
+        print("Baseline was recorded with different settings; not comparing.")
+        sys.exit(1)
+    regressions = compare(results, baseline, args.tolerance)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
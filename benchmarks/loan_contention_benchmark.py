@@ -0,0 +1,76 @@
+"""Fire concurrent checkouts at a single book and verify nothing is oversold.
+
+    python benchmarks/loan_contention_benchmark.py --requests 200 --workers 16 --copies 25
+
+DATABASE_URL defaults to a temporary SQLite file; point it at a scratch
+Postgres database to measure real row contention. The schema is recreated.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="Checkout attempts")
+    parser.add_argument("--workers", type=int, default=16, help="Parallel clients")
+    parser.add_argument("--copies", type=int, default=25, help="Copies of the contended book")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(), "contention_bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-of-sufficient-length")
+
+    from flask_jwt_extended import create_access_token
+    from app import create_app, db
+    from app.models import User, Book, Loan
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        admin = User(username="desk", email="desk@example.com", password_hash="-", is_admin=True)
+        db.session.add(admin)
+        db.session.add(Book(title="Popular Title", author="Someone", total_copies=args.copies,
+                            available_copies=args.copies))
+        db.session.commit()
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(admin.id))}"}
+
+    def checkout(_):
+        with app.test_client() as client:
+            response = client.post("/loans/creat", headers=headers,
+                                   data={"username": "desk", "book_title": "Popular Title"})
+            return response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        statuses = Counter(pool.map(checkout, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        remaining = db.session.execute(db.select(Book.available_copies)).scalar_one()
+        loans = db.session.execute(db.select(db.func.count(Loan.id))).scalar_one()
+
+    created, rejected = statuses.pop(201, 0), statuses.pop(400, 0)
+    expected_created = min(args.copies, args.requests)
+    print(f"requests:            {args.requests} over {args.workers} workers")
+    print(f"throughput:          {args.requests / elapsed:.1f} req/s")
+    print(f"loans created:       {created} (expected {expected_created})")
+    print(f"correct rejections:  {rejected} (expected {args.requests - expected_created})")
+    print(f"other responses:     {dict(statuses) or 'none'}")
+    print(f"copies remaining:    {remaining}, loan rows: {loans}")
+
+    ok = created == loans == expected_created and remaining == args.copies - created and remaining >= 0
+    print("result:              " + ("OK" if ok else "OVERSOLD OR INCONSISTENT"))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
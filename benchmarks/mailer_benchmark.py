@@ -0,0 +1,98 @@
+"""Compare pooled Mailer throughput with one SMTP connection per message.
+
+Needs aiosmtpd (pip install aiosmtpd), which runs a local stand-in SMTP
+server, so no real mail leaves the machine:
+
+    python benchmarks/mailer_benchmark.py --messages 2000 --pool-size 4
+"""
+import argparse
+import os
+import smtplib
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.mailer import Mailer
+
+
+class CountingHandler:
+    def __init__(self):
+        self.messages = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        with self._lock:
+            self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        with self._lock:
+            self.messages += 1
+        return "250 OK"
+
+    def reset(self):
+        self.messages = self.connections = 0
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def naive_send(host, port, messages):
+    for message in messages:
+        with smtplib.SMTP(host, port) as smtp:
+            smtp.send_message(message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--per-connection", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=0, help="Messages per second cap (0 = none)")
+    args = parser.parse_args()
+
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        sys.exit("aiosmtpd is required: pip install aiosmtpd")
+
+    handler = CountingHandler()
+    host, port = "127.0.0.1", free_port()
+    controller = Controller(handler, hostname=host, port=port)
+    controller.start()
+
+    mailer = Mailer()
+    mailer.configure(host=host, port=port, sender="library@localhost", pool_size=args.pool_size,
+                     max_per_connection=args.per_connection, rate=args.rate)
+    messages = [
+        mailer.message(f"patron{i}@example.com", "Due date reminder", "Your loan is due tomorrow.")
+        for i in range(args.messages)
+    ]
+
+    try:
+        print(f"{'mode':<28} {'msg/s':>10} {'connections':>12}")
+        for label, run in (
+            ("connection per message", lambda: naive_send(host, port, messages)),
+            (f"pooled ({args.pool_size} connections)", lambda: mailer.send_many(messages)),
+        ):
+            handler.reset()
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+            assert handler.messages == len(messages), handler.messages
+            print(f"{label:<28} {len(messages) / elapsed:>10.1f} {handler.connections:>12}")
+    finally:
+        mailer.close()
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Measure /books/search latency as the catalog grows.
+
+Run against a throwaway database; every size step drops and recreates the
+schema:
+
+    python benchmarks/search_benchmark.py --sizes 1000 10000 100000
+
+DATABASE_URL defaults to a temporary SQLite file (FTS5 path). Point it at a
+scratch Postgres database to measure the tsvector/pg_trgm path.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SYLLABLES = "ka lo mi ra ten sor vel dan qui bra nox tor lin esh mar uro fel zan pe gri".split()
+
+# Known books planted in every catalog size. Their lookups should cost the
+# same whether they sit among a thousand or a million other titles.
+MARKERS = [
+    ("Nineteen Eighty-Four", "George Orwell"),
+    ("The Trial", "Franz Kafka"),
+    ("Beloved", "Toni Morrison"),
+    ("Things Fall Apart", "Chinua Achebe"),
+]
+QUERIES = ["nineteen eighty", "orwel", "kafka trial", "belov", "achebe", "things fall"]
+
+
+def _word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def seed(db, Book, size, batch=5000):
+    from sqlalchemy import insert
+
+    rng = random.Random(size)
+    for start in range(0, size, batch):
+        rows = [
+            {
+                "title": " ".join(_word(rng) for _ in range(3)).title(),
+                "author": f"{_word(rng)} {_word(rng)}".title(),
+                "total_copies": 3,
+                "available_copies": 3,
+            }
+            for _ in range(min(batch, size - start))
+        ]
+        db.session.execute(insert(Book), rows)
+    db.session.execute(insert(Book), [
+        {"title": title, "author": author, "total_copies": 1, "available_copies": 1}
+        for title, author in MARKERS
+    ])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=50, help="Timed requests per query")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(), "search_bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+
+    from app import create_app, db
+    from app.models import Book
+
+    app = create_app()
+    client = app.test_client()
+
+    print(f"{'books':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    with app.app_context():
+        for size in args.sizes:
+            db.drop_all()
+            db.create_all()
+            seed(db, Book, size)
+
+            timings = []
+            for q in QUERIES:
+                client.get("/books/search", query_string={"q": q})
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    response = client.get("/books/search", query_string={"q": q})
+                    timings.append((time.perf_counter() - started) * 1000)
+                    assert response.status_code == 200, response.data
+
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(f"{size:>10} {statistics.median(timings):>8.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
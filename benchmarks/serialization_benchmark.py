@@ -0,0 +1,135 @@
+"""Compare list serialization: ORM objects + stdlib JSON vs column rows + orjson.
+
+    python benchmarks/serialization_benchmark.py --rows 500 --iterations 200
+
+For a page of books, loans and users, times three paths from query to JSON
+text: the previous one (ORM objects, hand-built dicts, Flask's stdlib
+provider with HTTP dates), column rows through row_serializer with the
+stdlib encoder, and the same rows with orjson. Reports the median per page
+in milliseconds and the speedup over the ORM path.
+
+DATABASE_URL defaults to a temporary SQLite file; the schema is recreated.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def seed(db, rows):
+    from sqlalchemy import insert
+    from app.models import User, Book, Loan
+
+    db.drop_all()
+    db.create_all()
+    db.session.execute(insert(User), [
+        {"username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x"}
+        for i in range(rows)
+    ])
+    db.session.execute(insert(Book), [
+        {"title": f"Benchmark Book {i}", "author": f"Author {i % 97}", "total_copies": 3, "available_copies": 3}
+        for i in range(rows)
+    ])
+    now = datetime.utcnow()
+    db.session.execute(insert(Loan), [
+        {"user_id": i % rows + 1, "book_id": i % rows + 1, "loan_date": now - timedelta(days=i % 60),
+         "due_date": now + timedelta(days=14), "is_returned": False}
+        for i in range(rows)
+    ])
+    db.session.commit()
+
+
+def paths(app, db, rows):
+    from flask.json.provider import DefaultJSONProvider
+    from app.models import User, Book, Loan
+    from app.routes.books import BOOK_COLUMNS, books_to_dicts
+    from app.routes.loan import _loan_columns, loans_to_dicts
+    from app.routes.user import USER_COLUMNS, users_to_dicts
+    from app.utils.json_provider import FastJSONProvider
+
+    previous = DefaultJSONProvider(app)
+    stdlib = FastJSONProvider(app)
+    stdlib.use_orjson = False
+    fast = FastJSONProvider(app)
+
+    def orm(entity, to_dict):
+        def run(provider):
+            db.session.expunge_all()
+            objects = entity.query.order_by(entity.id).limit(rows).all()
+            return provider.dumps([to_dict(obj) for obj in objects])
+        return run
+
+    def columns(statement_columns, key, serializer):
+        def run(provider):
+            result = db.session.query(*statement_columns).order_by(key).limit(rows).all()
+            return provider.dumps(serializer(result))
+        return run
+
+    book_dict = lambda b: {"id": b.id, "title": b.title, "author": b.author,
+                           "total_copies": b.total_copies, "available_copies": b.available_copies}
+    loan_dict = lambda l: {"loan_id": l.id, "user_id": l.user_id, "book_id": l.book_id,
+                           "loan_date": l.loan_date, "due_date": l.due_date}
+    user_dict = lambda u: {"id": u.id, "username": u.username, "email": u.email}
+
+    return {
+        "books": [
+            ("orm + stdlib", orm(Book, book_dict), previous),
+            ("rows + stdlib", columns(BOOK_COLUMNS, Book.id, books_to_dicts), stdlib),
+            ("rows + orjson", columns(BOOK_COLUMNS, Book.id, books_to_dicts), fast),
+        ],
+        "loans": [
+            ("orm + stdlib", orm(Loan, loan_dict), previous),
+            ("rows + stdlib", columns(_loan_columns(Loan), Loan.id, loans_to_dicts), stdlib),
+            ("rows + orjson", columns(_loan_columns(Loan), Loan.id, loans_to_dicts), fast),
+        ],
+        "users": [
+            ("orm + stdlib", orm(User, user_dict), previous),
+            ("rows + stdlib", columns(USER_COLUMNS, User.id, users_to_dicts), stdlib),
+            ("rows + orjson", columns(USER_COLUMNS, User.id, users_to_dicts), fast),
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500, help="Rows per page")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(), "serialization_bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-of-sufficient-length")
+    os.environ.setdefault("API_DOCS_ENABLED", "0")
+
+    from app import create_app, db
+    from app.utils.json_provider import orjson
+
+    app = create_app()
+    with app.app_context():
+        seed(db, args.rows)
+        if orjson is None:
+            print("orjson is not installed; the orjson rows fall back to the stdlib encoder.")
+
+        print(f"{'list':<7} {'path':<14} {'ms/page':>8} {'speedup':>8}")
+        for name, variants in paths(app, db, args.rows).items():
+            baseline = None
+            for label, run, provider in variants:
+                run(provider)
+                samples = []
+                for _ in range(args.iterations):
+                    started = time.perf_counter()
+                    run(provider)
+                    samples.append(time.perf_counter() - started)
+                median = statistics.median(samples) * 1000
+                baseline = baseline or median
+                print(f"{name:<7} {label:<14} {median:>8.3f} {baseline / median:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Compare request throughput of `flask run` and the gunicorn production mode.
+
+    python benchmarks/serving_benchmark.py --requests 3000 --concurrency 32
+
+Seeds a temporary SQLite database (or uses DATABASE_URL, whose schema is
+recreated), starts each server in turn on a free local port and drives
+GET /books/<id> and GET /books with keep-alive clients.
+"""
+import argparse
+import http.client
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed(books):
+    from sqlalchemy import insert
+    from app import create_app, db
+    from app.models import Book
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(insert(Book), [
+            {"title": f"Title {i}", "author": f"Author {i % 500}", "total_copies": 3, "available_copies": 3}
+            for i in range(books)
+        ])
+        db.session.commit()
+
+
+def wait_ready(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def drive(port, requests, concurrency, books):
+    per_client = requests // concurrency
+
+    def client(seed_value):
+        rng = random.Random(seed_value)
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        timings = []
+        for _ in range(per_client):
+            path = f"/books/{rng.randint(1, books)}" if rng.random() < 0.8 else "/books?limit=50"
+            started = time.perf_counter()
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            timings.append(time.perf_counter() - started)
+            if response.status != 200:
+                raise RuntimeError(f"{path} returned {response.status}")
+            if response.getheader("Connection", "").lower() == "close":
+                connection.close()
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        connection.close()
+        return timings
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        timings = sorted(t for result in pool.map(client, range(concurrency)) for t in result)
+    elapsed = time.perf_counter() - started
+    return len(timings) / elapsed, timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.99)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--books", type=int, default=5000)
+    parser.add_argument("--workers", default=str(os.cpu_count() or 2))
+    parser.add_argument("--threads", default="4")
+    parser.add_argument("--worker-classes", nargs="+", default=["gthread"],
+                        help="Gunicorn worker classes to compare (gthread, sync, gevent)")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if not env.get("DATABASE_URL"):
+        env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'serving_bench.db')}"
+    env.setdefault("SECRET_KEY", "benchmark-secret-key-of-sufficient-length")
+    env["FLASK_APP"] = "run.py"
+    os.environ.update(env)
+    seed(args.books)
+
+    servers = [("flask run", lambda port: ["flask", "run", "--port", str(port)], {})]
+    for worker_class in args.worker_classes:
+        servers.append((
+            f"gunicorn {worker_class}",
+            lambda port: ["gunicorn", "--config", "gunicorn.conf.py", "run:app"],
+            {"GUNICORN_WORKER_CLASS": worker_class, "GUNICORN_WORKERS": args.workers,
+             "GUNICORN_THREADS": args.threads, "GUNICORN_ACCESS_LOG": "/dev/null"},
+        ))
+
+    print(f"{'server':<20} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for label, command, extra_env in servers:
+        port = free_port()
+        server_env = dict(env, GUNICORN_BIND=f"127.0.0.1:{port}", **extra_env)
+        process = subprocess.Popen(command(port), cwd=ROOT, env=server_env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(port, process)
+            rps, p50, p99 = drive(port, args.requests, args.concurrency, args.books)
+            print(f"{label:<20} {rps:>10.1f} {p50:>8.2f} {p99:>8.2f}")
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Measure app import and create_app() time in fresh interpreters.
+
+    python benchmarks/startup_benchmark.py --runs 10
+    python benchmarks/startup_benchmark.py --max-import-ms 600 --max-create-ms 150
+
+Each run is a new Python process, so module caches do not hide import cost.
+Both API_DOCS_ENABLED settings are measured; with the --max-* budgets the
+script exits non-zero when the docs-disabled medians exceed them, so it
+can gate CI.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+print(json.dumps({"import": (imported - started) * 1000, "create": (created - imported) * 1000}))
+"""
+
+
+def measure(runs, docs_enabled):
+    env = dict(os.environ, API_DOCS_ENABLED="1" if docs_enabled else "0")
+    env.setdefault("DATABASE_URL", "sqlite://")
+    env.setdefault("SECRET_KEY", "benchmark-secret-key-of-sufficient-length")
+    samples = {"import": [], "create": []}
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+            check=True, capture_output=True, text=True,
+        ).stdout
+        for phase, value in json.loads(output.splitlines()[-1]).items():
+            samples[phase].append(value)
+    return {phase: statistics.median(values) for phase, values in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-import-ms", type=float, help="Fail if docs-off import median exceeds this")
+    parser.add_argument("--max-create-ms", type=float, help="Fail if docs-off create_app median exceeds this")
+    args = parser.parse_args()
+
+    print(f"{'api docs':<10} {'import ms':>10} {'create_app ms':>14} {'total ms':>9}")
+    results = {}
+    for docs_enabled in (True, False):
+        result = results[docs_enabled] = measure(args.runs, docs_enabled)
+        label = "on" if docs_enabled else "off"
+        print(f"{label:<10} {result['import']:>10.1f} {result['create']:>14.1f} "
+              f"{result['import'] + result['create']:>9.1f}")
+
+    off = results[False]
+    ok = True
+    if args.max_import_ms is not None and off["import"] > args.max_import_ms:
+        print(f"import median {off['import']:.1f} ms exceeds {args.max_import_ms} ms")
+        ok = False
+    if args.max_create_ms is not None and off["create"] > args.max_create_ms:
+        print(f"create_app median {off['create']:.1f} ms exceeds {args.max_create_ms} ms")
+        ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
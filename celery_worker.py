@@ -1,11 +1,58 @@
 from celery import Celery
+from flask import has_app_context
 import os
 
+_flask_app = None
+
+
+def get_flask_app():
+    global _flask_app
+    if _flask_app is None:
+        from app import create_app
+        _flask_app = create_app()
+    return _flask_app
+
+
 def make_celery():
-    return Celery(
+    celery = Celery(
         "library_app",
         broker=os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0"),
-        backend=os.getenv("CELERY_BACKEND_URL", "redis://redis:6379/0")
+        backend=os.getenv("CELERY_BACKEND_URL", "redis://redis:6379/0"),
+        include=["app.tasks.notify", "app.tasks.stats", "app.tasks.archive", "app.tasks.catalog"]
     )
+    # Runs tasks in-process (no broker needed) for local runs and debugging.
+    celery.conf.task_always_eager = os.getenv("CELERY_TASK_ALWAYS_EAGER") == "1"
+    celery.conf.beat_schedule = {
+        "overdue-sweep": {
+            "task": "app.tasks.notify.sweep_overdue_loans",
+            "schedule": float(os.getenv("OVERDUE_SWEEP_INTERVAL", "86400")),
+        },
+        "overdue-stats": {
+            "task": "app.tasks.stats.refresh_overdue_stats",
+            "schedule": float(os.getenv("OVERDUE_STATS_INTERVAL", "300")),
+        },
+        "loan-archive": {
+            "task": "app.tasks.archive.archive_returned_loans",
+            "schedule": float(os.getenv("LOAN_ARCHIVE_INTERVAL", "86400")),
+        },
+        "loan-partitions": {
+            "task": "app.tasks.archive.maintain_loan_partitions",
+            "schedule": float(os.getenv("LOAN_PARTITION_INTERVAL", "86400")),
+        },
+        "catalog-snapshot": {
+            "task": "app.tasks.catalog.refresh_catalog_snapshot",
+            "schedule": float(os.getenv("CATALOG_SNAPSHOT_INTERVAL", "600")),
+        },
+    }
+
+    class FlaskTask(celery.Task):
+        def __call__(self, *args, **kwargs):
+            if has_app_context():
+                return self.run(*args, **kwargs)
+            with get_flask_app().app_context():
+                return self.run(*args, **kwargs)
+
+    celery.Task = FlaskTask
+    return celery
 
-celery = make_celery()
\ No newline at end of file
+celery = make_celery()
@@ -4,3 +4,62 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.getenv("SECRET_KEY")
+    API_DOCS_ENABLED = os.getenv("API_DOCS_ENABLED", "1") == "1"
+    JSON_ENCODER = os.getenv("JSON_ENCODER", "auto")
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+    METRICS_N_PLUS_ONE_THRESHOLD = int(os.getenv("METRICS_N_PLUS_ONE_THRESHOLD", "5"))
+    # Shared totals for all workers; without it each process counts alone.
+    METRICS_REDIS_URL = os.getenv("METRICS_REDIS_URL")
+    # /metrics is only served when set, to clients sending it as a bearer token.
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+    # Per process: workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) must stay
+    # below the server's max_connections.
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+    # Set when DATABASE_URL points at PgBouncer in transaction pooling mode.
+    DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "0") == "1"
+
+    # Web processes sharing this config and their type; gunicorn.conf.py
+    # exports the real values, both are unset under the development server.
+    GUNICORN_WORKERS = int(os.getenv("GUNICORN_WORKERS", "1"))
+    GUNICORN_WORKER_CLASS = os.getenv("GUNICORN_WORKER_CLASS")
+
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "30"))
+    USER_CACHE_REDIS_URL = os.getenv("USER_CACHE_REDIS_URL")
+    CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "300"))
+    CATALOG_CACHE_REDIS_URL = os.getenv("CATALOG_CACHE_REDIS_URL")
+    CATALOG_SNAPSHOT_DIR = os.getenv("CATALOG_SNAPSHOT_DIR")
+    CATALOG_SNAPSHOT_BROTLI_QUALITY = int(os.getenv("CATALOG_SNAPSHOT_BROTLI_QUALITY", "9"))
+    CATALOG_SNAPSHOT_REDIS_URL = os.getenv("CATALOG_SNAPSHOT_REDIS_URL")
+    # Seconds writes are collected before one rebuild runs for all of them.
+    CATALOG_SNAPSHOT_DEBOUNCE = int(os.getenv("CATALOG_SNAPSHOT_DEBOUNCE", "5"))
+    INVENTORY_EVENTS_REDIS_URL = os.getenv("INVENTORY_EVENTS_REDIS_URL")
+    INVENTORY_EVENTS_KEEPALIVE = int(os.getenv("INVENTORY_EVENTS_KEEPALIVE", "15"))
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    # Hashing processes per web process (not per host): keep it small.
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "1"))
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "0"))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+    OVERDUE_SWEEP_CHUNK_SIZE = int(os.getenv("OVERDUE_SWEEP_CHUNK_SIZE", "1000"))
+    OVERDUE_NOTIFY_BATCH_SIZE = int(os.getenv("OVERDUE_NOTIFY_BATCH_SIZE", "100"))
+    # Days between reminders for a loan that stays overdue; 0 sends one notice only.
+    OVERDUE_REMINDER_DAYS = int(os.getenv("OVERDUE_REMINDER_DAYS", "7"))
+    LOAN_ARCHIVE_AFTER_DAYS = int(os.getenv("LOAN_ARCHIVE_AFTER_DAYS", "365"))
+    LOAN_ARCHIVE_BATCH_SIZE = int(os.getenv("LOAN_ARCHIVE_BATCH_SIZE", "1000"))
+    LOAN_PARTITION_MONTHS_AHEAD = int(os.getenv("LOAN_PARTITION_MONTHS_AHEAD", "3"))
+    MAIL_SERVER = os.getenv("MAIL_SERVER", "localhost")
+    MAIL_PORT = int(os.getenv("MAIL_PORT", "25"))
+    MAIL_USERNAME = os.getenv("MAIL_USERNAME")
+    MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
+    MAIL_USE_TLS = os.getenv("MAIL_USE_TLS", "0") == "1"
+    MAIL_DEFAULT_SENDER = os.getenv("MAIL_DEFAULT_SENDER", "library@localhost")
+    MAIL_POOL_SIZE = int(os.getenv("MAIL_POOL_SIZE", "4"))
+    MAIL_MAX_PER_CONNECTION = int(os.getenv("MAIL_MAX_PER_CONNECTION", "100"))
+    MAIL_RATE_LIMIT = float(os.getenv("MAIL_RATE_LIMIT", "0"))
+    MAIL_MAX_RETRIES = int(os.getenv("MAIL_MAX_RETRIES", "3"))
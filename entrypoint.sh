@@ -3,6 +3,12 @@
 echo "Veritabanı migration başlatılıyor..."
 flask db upgrade
 
-echo "Flask uygulaması başlatılıyor..."
-exec flask run --host=0.0.0.0 --port=5000
+# SERVER_MODE=production (default) runs gunicorn with gunicorn.conf.py;
+# SERVER_MODE=development runs the Flask debug server with reload.
+if [ "${SERVER_MODE:-production}" = "development" ]; then
+    echo "Flask geliştirme sunucusu başlatılıyor..."
+    exec flask run --debug --host=0.0.0.0 --port=5000
+fi
 
+echo "Gunicorn başlatılıyor..."
+exec gunicorn --config gunicorn.conf.py "run:app"
@@ -0,0 +1,56 @@
+# Gunicorn settings for the production server (SERVER_MODE=production in
+# entrypoint.sh). Every value can be overridden from the environment.
+#
+# Worker types, chosen with GUNICORN_WORKER_CLASS:
+#   gthread (default)  GUNICORN_WORKERS processes x GUNICORN_THREADS threads.
+#                      Good general default; CPU work (hashing, JSON) scales
+#                      with processes, blocking DB/Redis I/O with threads.
+#   sync               One request per process; use with threads=1 when
+#                      requests are CPU bound.
+#   gevent             Cooperative greenlets, GUNICORN_WORKER_CONNECTIONS per
+#                      process. For many slow or idle connections (SSE,
+#                      kiosks). Serves /books/events, which the other
+#                      worker types refuse; the `events` compose service
+#                      runs this class.
+import multiprocessing
+import os
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+# The preloaded app only serves event streams from gevent workers.
+os.environ["GUNICORN_WORKER_CLASS"] = worker_class
+
+if worker_class == "gevent":
+    # Patch before the app (and its socket/thread users) is preloaded.
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", str(multiprocessing.cpu_count() * 2 + 1)))
+# The preloaded app reads it to refuse per-process caches across workers.
+os.environ["GUNICORN_WORKERS"] = str(workers)
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+# Import the app once in the master so workers fork with it already loaded.
+preload_app = True
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    if worker_class == "gevent":
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+
+    # Connections opened by the master must not be shared with the workers;
+    # close=False leaves the parent's sockets alone and just drops the pool.
+    from app import db
+    app = server.app.wsgi()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
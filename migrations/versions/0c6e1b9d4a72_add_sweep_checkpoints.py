@@ -0,0 +1,30 @@
+"""add sweep checkpoints
+
+Revision ID: 0c6e1b9d4a72
+Revises: f3a9c5d7e281
+Create Date: 2026-10-18 14:05:12.630184
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c6e1b9d4a72'
+down_revision = 'f3a9c5d7e281'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sweep_checkpoints',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('sweep_checkpoints')
@@ -0,0 +1,38 @@
+"""add loan returned at
+
+Revision ID: 4f7b1d9e2a63
+Revises: e8a2f4c6b091
+Create Date: 2026-10-18 21:48:03.114752
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f7b1d9e2a63'
+down_revision = 'e8a2f4c6b091'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Loans returned before this column existed keep NULL; incremental
+    # exports pick up returns from here on.
+    with op.batch_alter_table('loans', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('returned_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_loans_returned_at'), ['returned_at'], unique=False)
+
+    with op.batch_alter_table('loans_archive', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('returned_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_loans_archive_returned_at'), ['returned_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('loans_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_loans_archive_returned_at'))
+        batch_op.drop_column('returned_at')
+
+    with op.batch_alter_table('loans', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_loans_returned_at'))
+        batch_op.drop_column('returned_at')
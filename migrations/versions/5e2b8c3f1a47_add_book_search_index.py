@@ -0,0 +1,65 @@
+"""add book search index
+
+Revision ID: 5e2b8c3f1a47
+Revises: d41f6a2b9c10
+Create Date: 2026-10-18 11:02:37.540921
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2b8c3f1a47'
+down_revision = 'd41f6a2b9c10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "ALTER TABLE books ADD COLUMN search_vector tsvector "
+            "GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(author, '')), 'B')"
+            ") STORED"
+        )
+        op.execute("CREATE INDEX ix_books_search_vector ON books USING gin (search_vector)")
+        op.execute("CREATE INDEX ix_books_title_trgm ON books USING gin (title gin_trgm_ops)")
+        op.execute("CREATE INDEX ix_books_author_trgm ON books USING gin (author gin_trgm_ops)")
+    elif dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE books_fts USING fts5("
+            "title, author, content='books', content_rowid='id')"
+        )
+        op.execute(
+            "CREATE TRIGGER books_fts_ai AFTER INSERT ON books BEGIN "
+            "INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author); END"
+        )
+        op.execute(
+            "CREATE TRIGGER books_fts_ad AFTER DELETE ON books BEGIN "
+            "INSERT INTO books_fts(books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author); END"
+        )
+        op.execute(
+            "CREATE TRIGGER books_fts_au AFTER UPDATE OF title, author ON books BEGIN "
+            "INSERT INTO books_fts(books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author); "
+            "INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author); END"
+        )
+        op.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_books_author_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_books_title_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_books_search_vector")
+        op.execute("ALTER TABLE books DROP COLUMN IF EXISTS search_vector")
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS books_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS books_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS books_fts_ai")
+        op.execute("DROP TABLE IF EXISTS books_fts")
@@ -0,0 +1,74 @@
+"""add circulation rollups
+
+Revision ID: 6d2f8a1e3b55
+Revises: 0c6e1b9d4a72
+Create Date: 2026-10-18 15:11:46.093327
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d2f8a1e3b55'
+down_revision = '0c6e1b9d4a72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('loan_daily_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('shard', sa.SmallInteger(), nullable=False),
+    sa.Column('loans_created', sa.Integer(), nullable=False),
+    sa.Column('loans_returned', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'shard')
+    )
+    op.create_table('book_loan_stats',
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('total_loans', sa.BigInteger(), nullable=False),
+    sa.Column('active_loans', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('book_id')
+    )
+    with op.batch_alter_table('book_loan_stats', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_book_loan_stats_total_loans'), ['total_loans'], unique=False)
+
+    op.create_table('stat_snapshots',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    with op.batch_alter_table('loans', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_loans_open_due_date', ['due_date'], unique=False,
+            postgresql_where=sa.text('is_returned = false'),
+            sqlite_where=sa.text('is_returned = 0')
+        )
+
+    # Backfill from existing loans. Return dates were never stored, so
+    # loans_returned only counts returns made from now on.
+    day = "date(loan_date)" if op.get_bind().dialect.name == 'sqlite' else "CAST(loan_date AS DATE)"
+    op.execute(
+        "INSERT INTO loan_daily_stats (day, shard, loans_created, loans_returned) "
+        f"SELECT {day}, 0, COUNT(*), 0 FROM loans "
+        f"WHERE loan_date IS NOT NULL GROUP BY {day}"
+    )
+    op.execute(
+        "INSERT INTO book_loan_stats (book_id, total_loans, active_loans) "
+        "SELECT book_id, COUNT(*), SUM(CASE WHEN is_returned THEN 0 ELSE 1 END) "
+        "FROM loans GROUP BY book_id"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('loans', schema=None) as batch_op:
+        batch_op.drop_index('ix_loans_open_due_date')
+
+    op.drop_table('stat_snapshots')
+    with op.batch_alter_table('book_loan_stats', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_book_loan_stats_total_loans'))
+
+    op.drop_table('book_loan_stats')
+    op.drop_table('loan_daily_stats')
@@ -0,0 +1,52 @@
+"""shard change counters
+
+Revision ID: 7c3e9a1f5d28
+Revises: 4f7b1d9e2a63
+Create Date: 2026-10-18 23:05:37.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3e9a1f5d28'
+down_revision = '4f7b1d9e2a63'
+branch_labels = None
+depends_on = None
+
+
+def _versions():
+    rows = op.get_bind().execute(sa.text(
+        "SELECT name, SUM(version) FROM change_counters GROUP BY name"
+    )).all()
+    return {name: int(version or 0) for name, version in rows}
+
+
+def upgrade():
+    # The table is a handful of rows: rebuild it with the shard in the key,
+    # carrying each counter over as shard 0.
+    versions = _versions()
+    op.drop_table('change_counters')
+    change_counters = op.create_table('change_counters',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('shard', sa.SmallInteger(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name', 'shard')
+    )
+    op.bulk_insert(change_counters, [
+        {'name': name, 'shard': 0, 'version': version} for name, version in versions.items()
+    ])
+
+
+def downgrade():
+    versions = _versions()
+    op.drop_table('change_counters')
+    change_counters = op.create_table('change_counters',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(change_counters, [
+        {'name': name, 'version': version} for name, version in versions.items()
+    ])
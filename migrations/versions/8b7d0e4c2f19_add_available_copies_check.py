@@ -0,0 +1,48 @@
+"""add available_copies check
+
+Revision ID: 8b7d0e4c2f19
+Revises: 5e2b8c3f1a47
+Create Date: 2026-10-18 11:48:15.204773
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b7d0e4c2f19'
+down_revision = '5e2b8c3f1a47'
+branch_labels = None
+depends_on = None
+
+# On SQLite batch mode rebuilds the books table, which drops its triggers.
+SQLITE_FTS_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN "
+    "INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author); END",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author); END",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author); "
+    "INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author); END",
+]
+
+
+def _restore_sqlite_triggers():
+    if op.get_bind().dialect.name == 'sqlite':
+        for statement in SQLITE_FTS_TRIGGERS:
+            op.execute(statement)
+
+
+def upgrade():
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.create_check_constraint(
+            'ck_books_available_copies_nonnegative',
+            'available_copies >= 0'
+        )
+    _restore_sqlite_triggers()
+
+
+def downgrade():
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.drop_constraint('ck_books_available_copies_nonnegative', type_='check')
+    _restore_sqlite_triggers()
@@ -0,0 +1,43 @@
+"""index username and title
+
+Revision ID: 9a4c7e2d5b13
+Revises: 6d2f8a1e3b55
+Create Date: 2026-10-18 17:02:31.550214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4c7e2d5b13'
+down_revision = '6d2f8a1e3b55'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT username, count(*) FROM users GROUP BY username HAVING count(*) > 1 "
+        "ORDER BY username LIMIT 20"
+    )).all()
+    if duplicates:
+        names = ", ".join(f"{username!r} ({count} users)" for username, count in duplicates)
+        raise RuntimeError(
+            "Cannot create unique index ix_users_username; rename or merge these users "
+            f"and rerun the upgrade: {names}"
+        )
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_username'), ['username'], unique=True)
+
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_books_title'), ['title'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_books_title'))
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_username'))
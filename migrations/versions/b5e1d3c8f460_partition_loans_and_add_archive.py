@@ -0,0 +1,157 @@
+"""partition loans and add archive
+
+Revision ID: b5e1d3c8f460
+Revises: 9a4c7e2d5b13
+Create Date: 2026-10-18 18:24:09.731865
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e1d3c8f460'
+down_revision = '9a4c7e2d5b13'
+branch_labels = None
+depends_on = None
+
+# Partitions are created this far ahead; the maintain_loan_partitions task
+# keeps extending them.
+MONTHS_AHEAD = 3
+
+_INDEXES = ('ix_loans_user_id', 'ix_loans_book_id', 'ix_loans_due_date', 'ix_loans_open', 'ix_loans_open_due_date')
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_indexes():
+    op.create_index('ix_loans_user_id', 'loans', ['user_id'], unique=False)
+    op.create_index('ix_loans_book_id', 'loans', ['book_id'], unique=False)
+    op.create_index('ix_loans_due_date', 'loans', ['due_date'], unique=False)
+    op.create_index('ix_loans_open', 'loans', ['id'], unique=False,
+                    postgresql_where=sa.text('is_returned = false'))
+    op.create_index('ix_loans_open_due_date', 'loans', ['due_date'], unique=False,
+                    postgresql_where=sa.text('is_returned = false'))
+
+
+def _swap_out_loans():
+    """Rename the current loans table out of the way, freeing its names."""
+    op.execute("ALTER TABLE loans RENAME TO loans_old")
+    op.execute("ALTER TABLE loans_old RENAME CONSTRAINT loans_pkey TO loans_old_pkey")
+    for name in _INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("ALTER SEQUENCE loans_id_seq OWNED BY NONE")
+
+
+def _partition_loans():
+    # Postgres requires the partition key in the primary key, so it becomes
+    # (id, loan_date); ids still come from the one sequence and stay unique.
+    # Copying the rows takes a lock on loans for the duration of the upgrade.
+    bind = op.get_bind()
+    _swap_out_loans()
+    op.execute("""
+        CREATE TABLE loans (
+            id INTEGER NOT NULL DEFAULT nextval('loans_id_seq'),
+            user_id INTEGER NOT NULL,
+            book_id INTEGER NOT NULL,
+            loan_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            due_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            is_returned BOOLEAN,
+            CONSTRAINT loans_pkey PRIMARY KEY (id, loan_date),
+            CONSTRAINT loans_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id),
+            CONSTRAINT loans_book_id_fkey FOREIGN KEY (book_id) REFERENCES books (id)
+        ) PARTITION BY RANGE (loan_date)
+    """)
+    op.execute("CREATE TABLE loans_default PARTITION OF loans DEFAULT")
+
+    this_month = date.today().replace(day=1)
+    oldest = bind.execute(sa.text("SELECT min(loan_date) FROM loans_old")).scalar()
+    month = min(oldest.date().replace(day=1), this_month) if oldest else this_month
+    while month <= _add_months(this_month, MONTHS_AHEAD):
+        end = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE loans_y{month.year:04d}m{month.month:02d} PARTITION OF loans "
+            f"FOR VALUES FROM ('{month}') TO ('{end}')"
+        )
+        month = end
+
+    op.execute(
+        "INSERT INTO loans (id, user_id, book_id, loan_date, due_date, is_returned) "
+        "SELECT id, user_id, book_id, loan_date, due_date, is_returned FROM loans_old"
+    )
+    op.execute("DROP TABLE loans_old")
+    op.execute("ALTER SEQUENCE loans_id_seq OWNED BY loans.id")
+    _create_indexes()
+
+
+def _unpartition_loans():
+    _swap_out_loans()
+    op.execute("""
+        CREATE TABLE loans (
+            id INTEGER NOT NULL DEFAULT nextval('loans_id_seq'),
+            user_id INTEGER NOT NULL,
+            book_id INTEGER NOT NULL,
+            loan_date TIMESTAMP WITHOUT TIME ZONE,
+            due_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            is_returned BOOLEAN,
+            CONSTRAINT loans_pkey PRIMARY KEY (id),
+            CONSTRAINT loans_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id),
+            CONSTRAINT loans_book_id_fkey FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+    """)
+    op.execute(
+        "INSERT INTO loans (id, user_id, book_id, loan_date, due_date, is_returned) "
+        "SELECT id, user_id, book_id, loan_date, due_date, is_returned FROM loans_old"
+    )
+    op.execute("DROP TABLE loans_old")
+    op.execute("ALTER SEQUENCE loans_id_seq OWNED BY loans.id")
+    _create_indexes()
+
+
+def upgrade():
+    op.execute("UPDATE loans SET loan_date = due_date WHERE loan_date IS NULL")
+    if op.get_bind().dialect.name == 'postgresql':
+        _partition_loans()
+    else:
+        with op.batch_alter_table('loans', schema=None) as batch_op:
+            batch_op.alter_column('loan_date', existing_type=sa.DateTime(), nullable=False)
+
+    op.create_table('loans_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('loan_date', sa.DateTime(), nullable=False),
+    sa.Column('due_date', sa.DateTime(), nullable=False),
+    sa.Column('is_returned', sa.Boolean(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('loans_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_loans_archive_book_id'), ['book_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_loans_archive_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    # Archived rows go back into loans so no history is lost.
+    op.execute(
+        "INSERT INTO loans (id, user_id, book_id, loan_date, due_date, is_returned) "
+        "SELECT id, user_id, book_id, loan_date, due_date, is_returned FROM loans_archive"
+    )
+    with op.batch_alter_table('loans_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_loans_archive_user_id'))
+        batch_op.drop_index(batch_op.f('ix_loans_archive_book_id'))
+
+    op.drop_table('loans_archive')
+
+    if op.get_bind().dialect.name == 'postgresql':
+        _unpartition_loans()
+    else:
+        with op.batch_alter_table('loans', schema=None) as batch_op:
+            batch_op.alter_column('loan_date', existing_type=sa.DateTime(), nullable=True)
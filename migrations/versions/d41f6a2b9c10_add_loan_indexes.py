@@ -0,0 +1,36 @@
+"""add loan indexes
+
+Revision ID: d41f6a2b9c10
+Revises: c7c388188b8b
+Create Date: 2026-10-18 10:12:04.118342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41f6a2b9c10'
+down_revision = 'c7c388188b8b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('loans', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_loans_user_id'), ['user_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_loans_book_id'), ['book_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_loans_due_date'), ['due_date'], unique=False)
+        batch_op.create_index(
+            'ix_loans_open', ['id'], unique=False,
+            postgresql_where=sa.text('is_returned = false'),
+            sqlite_where=sa.text('is_returned = 0')
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('loans', schema=None) as batch_op:
+        batch_op.drop_index('ix_loans_open')
+        batch_op.drop_index(batch_op.f('ix_loans_due_date'))
+        batch_op.drop_index(batch_op.f('ix_loans_book_id'))
+        batch_op.drop_index(batch_op.f('ix_loans_user_id'))
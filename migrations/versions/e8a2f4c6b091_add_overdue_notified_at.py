@@ -0,0 +1,26 @@
+"""add overdue notified at
+
+Revision ID: e8a2f4c6b091
+Revises: b5e1d3c8f460
+Create Date: 2026-10-18 21:12:40.518263
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8a2f4c6b091'
+down_revision = 'b5e1d3c8f460'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('loans', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('overdue_notified_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('loans', schema=None) as batch_op:
+        batch_op.drop_column('overdue_notified_at')
@@ -0,0 +1,32 @@
+"""add change counters
+
+Revision ID: f3a9c5d7e281
+Revises: 8b7d0e4c2f19
+Create Date: 2026-10-18 13:20:51.772910
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9c5d7e281'
+down_revision = '8b7d0e4c2f19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    change_counters = op.create_table('change_counters',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(change_counters, [
+        {'name': 'books', 'version': 0},
+        {'name': 'loans', 'version': 0},
+    ])
+
+
+def downgrade():
+    op.drop_table('change_counters')
@@ -0,0 +1,22 @@
+import os
+import tempfile
+
+# Always a throwaway SQLite file: the fixtures drop every table.
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "tests.db")
+os.environ.setdefault("SECRET_KEY", "test-secret-key-of-sufficient-length")
+os.environ.setdefault("API_DOCS_ENABLED", "0")
+
+import pytest
+
+from app import create_app, db
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
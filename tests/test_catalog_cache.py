@@ -0,0 +1,24 @@
+from app import db
+from app.models import Book
+from app.utils.catalog_cache import catalog_cache
+from app.utils.versioning import current_version
+
+
+def test_body_built_before_a_write_is_not_served_after_it(app):
+    db.session.add(Book(id=1, title="Dune", author="Frank Herbert", total_copies=1, available_copies=1))
+    db.session.commit()
+    version = current_version(db.session, "books")
+
+    # A reader builds the old body, a write commits, then the reader stores it.
+    def build():
+        book = db.session.get(Book, 1)
+        body = f'{{"available_copies": {book.available_copies}}}'
+        book.available_copies = 0
+        db.session.commit()
+        return body
+
+    assert catalog_cache.get_book(1, version, build) == '{"available_copies": 1}'
+
+    response = app.test_client().get("/books/1")
+    assert response.json["available_copies"] == 0
+    assert response.headers["ETag"] == f'"books-{current_version(db.session, "books")}"'
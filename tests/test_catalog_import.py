@@ -0,0 +1,42 @@
+import io
+
+from app.models import Book
+from app.utils.catalog_import import import_books
+
+
+def run_import(body, fmt="csv"):
+    return import_books(io.BytesIO(body.encode("utf-8") if isinstance(body, str) else body), fmt)
+
+
+def test_repeated_rows_in_one_feed_are_inserted_once(app):
+    report = run_import("title,author,total_copies\nDune,Herbert,2\nDune,Herbert,3\nEmma,Austen,1\n")
+
+    assert report["inserted"] == 2
+    assert report["skipped_duplicates"] == 1
+    assert report["skipped_existing"] == 0
+    assert sorted((book.title, book.total_copies) for book in Book.query) == [("Dune", 3), ("Emma", 1)]
+
+
+def test_reimport_skips_existing_books(app):
+    feed = "title,author,total_copies\nDune,Herbert,2\nDune,Herbert,2\n"
+    run_import(feed)
+    report = run_import(feed)
+
+    assert report["inserted"] == 0
+    assert report["skipped_existing"] == 1
+    assert report["skipped_duplicates"] == 1
+    assert Book.query.count() == 1
+
+
+def test_bad_rows_are_rejected_not_fatal(app):
+    body = (
+        b'{"title": 1984, "author": "Orwell", "total_copies": 2}\n'
+        b'{"title": "Bad \xff", "author": "A", "total_copies": 1}\n'
+        b'{"title": "Ok", "author": "A", "total_copies": true}\n'
+        b'not json\n'
+        b'{"title": "Ok", "author": "A", "total_copies": 2}\n'
+    )
+    report = run_import(body, "ndjson")
+
+    assert report["inserted"] == 1
+    assert [rejection["row"] for rejection in report["rejections"]] == [1, 2, 3, 4]
@@ -0,0 +1,62 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from app import db
+from app.models import Book
+from app.utils import catalog_snapshot as snapshot_module
+from app.utils.catalog_snapshot import catalog_snapshot
+
+
+@pytest.fixture
+def snapshot(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_snapshot, "directory", str(tmp_path))
+    db.session.add_all(
+        Book(id=book_id, title=f"Book {book_id} é", author="Author", total_copies=2, available_copies=2)
+        for book_id in range(1, 31)
+    )
+    db.session.commit()
+    return catalog_snapshot
+
+
+def read(snapshot, manifest, suffix=""):
+    with open(os.path.join(snapshot.directory, manifest["file"] + suffix), "rb") as handle:
+        data = handle.read()
+    return json.loads(gzip.decompress(data) if suffix == ".gz" else data)
+
+
+def test_incremental_rebuild_matches_a_full_one(snapshot, monkeypatch):
+    # Tiny batches and reads make every book cross a chunk boundary.
+    monkeypatch.setattr(snapshot_module, "BATCH_SIZE", 4)
+    monkeypatch.setattr(snapshot_module, "READ_CHUNK_SIZE", 7)
+    snapshot.build()
+
+    db.session.get(Book, 5).available_copies = 0
+    db.session.delete(db.session.get(Book, 1))
+    db.session.add(Book(id=40, title="New", author="Author", total_copies=1, available_copies=1))
+    db.session.commit()
+
+    incremental = snapshot.build([1, 5, 40])
+    full = snapshot.build()
+
+    assert incremental["etag"] == full["etag"]
+    assert incremental["books"] == full["books"] == 30
+    books = read(snapshot, incremental, ".gz")
+    assert [book["id"] for book in books] == list(range(2, 31)) + [40]
+    assert books[3] == {"id": 5, "title": "Book 5 é", "author": "Author", "total_copies": 2, "available_copies": 0}
+
+
+def test_snapshot_behind_the_books_version_is_not_served(snapshot, app):
+    snapshot.build()
+    client = app.test_client()
+
+    assert "X-Catalog-Version" in client.get("/books?stream=1").headers
+
+    db.session.add(Book(id=40, title="New", author="Author", total_copies=1, available_copies=1))
+    db.session.commit()
+    response = client.get("/books?stream=1")
+
+    assert "X-Catalog-Version" not in response.headers
+    assert response.json[-1]["id"] == 40
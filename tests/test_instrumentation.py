@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import create_app, db
+from app.utils.instrumentation import _RedisStore, request_metrics
+from config import Config
+
+TOKEN = "scrape-token"
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_TOKEN", TOKEN)
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def scrape(client, token=TOKEN):
+    return client.get("/metrics", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_metrics_need_the_token(app):
+    client = app.test_client()
+
+    assert client.get("/metrics").status_code == 401
+    assert scrape(client, "wrong").status_code == 401
+    assert scrape(client).status_code == 200
+
+
+def test_metrics_are_not_served_without_a_token(monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_TOKEN", None)
+
+    assert create_app().test_client().get("/metrics").status_code == 404
+
+
+def test_failed_statement_does_not_leak_its_start_time(app):
+    @app.route("/fails")
+    def fails():
+        with pytest.raises(OperationalError):
+            db.session.execute(text("SELECT * FROM no_such_table"))
+        db.session.rollback()
+        return {"pending": len(db.session.connection().info.get("_query_started", []))}
+
+    assert app.test_client().get("/fails").json == {"pending": 0}
+
+
+def test_redis_store_adds_up_every_worker(app, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = fakeredis.FakeRedis()
+    monkeypatch.setattr(request_metrics, "_errors", ())
+    client = app.test_client()
+
+    # Each request is recorded by a different worker's store.
+    for _ in range(2):
+        monkeypatch.setattr(request_metrics, "store", _RedisStore(redis))
+        client.get("/books")
+
+    assert 'http_requests_total{endpoint="books.get_all_books",method="GET",status="200"} 2' in scrape(client).text
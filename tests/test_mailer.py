@@ -0,0 +1,35 @@
+import pytest
+
+from app.utils import mailer as mailer_module
+from app.utils.mailer import RateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock that ``time.sleep`` advances."""
+    now = [0.0]
+    monkeypatch.setattr(mailer_module.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(mailer_module.time, "sleep", lambda seconds: now.__setitem__(0, now[0] + seconds))
+    return now
+
+
+@pytest.mark.parametrize("rate", [0.5, 0.25])
+def test_fractional_rate_sends_one_message_per_interval(clock, rate):
+    limiter = RateLimiter(rate)
+
+    for _ in range(4):
+        limiter.acquire()
+
+    # The first message goes out at once, then one every 1 / rate seconds.
+    assert clock[0] == pytest.approx(3 / rate)
+
+
+def test_whole_rate_allows_a_burst_of_rate_messages(clock):
+    limiter = RateLimiter(4)
+
+    for _ in range(4):
+        limiter.acquire()
+    assert clock[0] == 0
+
+    limiter.acquire()
+    assert clock[0] == pytest.approx(0.25)
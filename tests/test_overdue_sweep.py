@@ -0,0 +1,138 @@
+"""Overdue sweep against SQLite, with Celery in eager mode so no Redis is needed."""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from app import db
+from app.models import Book, Loan, SweepCheckpoint, User
+from app.tasks import notify
+from app.utils.mailer import mailer
+from celery_worker import celery
+
+LOANS = 25
+CHUNK_SIZE = 10
+
+
+@pytest.fixture
+def app(app, monkeypatch):
+    app.config.update(OVERDUE_SWEEP_CHUNK_SIZE=CHUNK_SIZE, OVERDUE_NOTIFY_BATCH_SIZE=4, OVERDUE_REMINDER_DAYS=7)
+    monkeypatch.setattr(celery.conf, "task_always_eager", True)
+    return app
+
+
+@pytest.fixture
+def overdue_loans(app):
+    now = datetime.utcnow()
+    db.session.add(User(id=1, username="reader", email="reader@example.com", password_hash="x"))
+    db.session.add(Book(id=1, title="Dune", author="Frank Herbert", total_copies=LOANS + 2, available_copies=0))
+    db.session.execute(insert(Loan), [
+        {"user_id": 1, "book_id": 1, "loan_date": now - timedelta(days=30), "due_date": now - timedelta(days=2),
+         "is_returned": False}
+        for _ in range(LOANS)
+    ])
+    # Neither returned nor not-yet-due loans are ever notified.
+    db.session.execute(insert(Loan), [
+        {"user_id": 1, "book_id": 1, "loan_date": now - timedelta(days=30), "due_date": now - timedelta(days=2),
+         "is_returned": True},
+        {"user_id": 1, "book_id": 1, "loan_date": now, "due_date": now + timedelta(days=14), "is_returned": False},
+    ])
+    db.session.commit()
+    return list(range(1, LOANS + 1))
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Subjects of every notice handed to the mailer, in order."""
+    subjects = []
+
+    def send_many(messages):
+        subjects.extend(message["Subject"] for message in messages)
+        return len(messages), []
+
+    monkeypatch.setattr(mailer, "send_many", send_many)
+    return subjects
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    """Loan id batches passed to notify_overdue, in order."""
+    batches = []
+    delay = notify.notify_overdue.delay
+
+    def record(loan_ids):
+        batches.append(list(loan_ids))
+        return delay(loan_ids)
+
+    monkeypatch.setattr(notify.notify_overdue, "delay", record)
+    return batches
+
+
+def checkpoint():
+    db.session.expire_all()
+    return db.session.get(SweepCheckpoint, notify.OVERDUE_SWEEP)
+
+
+def test_sweep_walks_in_chunks_and_resets_checkpoint(overdue_loans, sent, queued):
+    result = notify.sweep_overdue_loans.apply().get()
+
+    assert result == {"loans": LOANS, "chunks": 3}
+    assert [len(batch) for batch in queued] == [4, 4, 2, 4, 4, 2, 4, 1]
+    assert sorted(sum(queued, [])) == overdue_loans
+    assert len(sent) == LOANS
+    assert checkpoint().last_id == 0
+    assert checkpoint().started_at is None
+
+
+def test_notified_loans_are_not_notified_again(overdue_loans, sent, queued):
+    notify.sweep_overdue_loans.apply()
+    sent.clear()
+
+    assert notify.sweep_overdue_loans.apply().get() == {"loans": 0, "chunks": 1}
+    assert sent == []
+
+
+def test_reminder_after_reminder_days(overdue_loans, sent, queued):
+    notify.sweep_overdue_loans.apply()
+    sent.clear()
+    Loan.query.filter(Loan.id <= 3).update({"overdue_notified_at": datetime.utcnow() - timedelta(days=8)})
+    db.session.commit()
+
+    assert notify.sweep_overdue_loans.apply().get()["loans"] == 3
+    assert len(sent) == 3
+
+
+def test_max_chunks_requeues_the_rest(overdue_loans, sent, queued):
+    assert notify.sweep_overdue_loans.apply(kwargs={"max_chunks": 1}).get() == {"loans": CHUNK_SIZE, "chunks": 1}
+    # The re-queued task ran eagerly and finished the sweep.
+    assert sorted(sum(queued, [])) == overdue_loans
+    assert checkpoint().last_id == 0
+
+
+def test_sweep_resumes_after_interrupted_chunk(app, overdue_loans, sent, queued, monkeypatch):
+    assert notify.sweep_chunk(CHUNK_SIZE, 4) == CHUNK_SIZE
+    assert checkpoint().last_id == CHUNK_SIZE
+
+    # The second chunk dies before its commit: nothing is queued or stamped
+    # and the checkpoint stays where the first chunk left it.
+    commit = db.session.commit
+
+    def fail():
+        raise RuntimeError("worker lost")
+
+    monkeypatch.setattr(db.session, "commit", fail)
+    with pytest.raises(RuntimeError):
+        notify.sweep_chunk(CHUNK_SIZE, 4)
+    db.session.rollback()
+    monkeypatch.setattr(db.session, "commit", commit)
+
+    assert len(sum(queued, [])) == CHUNK_SIZE
+    assert checkpoint().last_id == CHUNK_SIZE
+    assert Loan.query.filter(Loan.overdue_notified_at.isnot(None)).count() == CHUNK_SIZE
+
+    result = notify.sweep_overdue_loans.apply().get()
+
+    assert result == {"loans": LOANS - CHUNK_SIZE, "chunks": 2}
+    assert sorted(sum(queued, [])) == overdue_loans
+    assert len(sent) == LOANS
+    assert checkpoint().last_id == 0
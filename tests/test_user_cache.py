@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils.user_cache import UserCache
+
+
+def make_cache(redis=None):
+    cache = UserCache()
+    cache.ttl = 30
+    if redis is not None:
+        cache.redis = redis
+        cache._redis_errors = (ValueError,)
+        cache._ensure_listener = lambda: None
+    return cache
+
+
+def user(is_admin):
+    return SimpleNamespace(id=1, username="reader", email="reader@example.com", is_admin=is_admin)
+
+
+def racing_loader(cache):
+    """Reads the row, then lets a demotion commit and invalidate before returning."""
+    def load(user_id):
+        row = user(is_admin=True)
+        cache.invalidate(user_id)
+        return row
+    return load
+
+
+def test_load_that_lost_to_an_invalidation_is_not_cached():
+    cache = make_cache()
+
+    assert cache.get(1, racing_loader(cache)).is_admin
+    assert not cache.get(1, lambda user_id: user(is_admin=False)).is_admin
+
+
+def test_unraced_load_is_cached():
+    cache = make_cache()
+    cache.get(1, lambda user_id: user(is_admin=True))
+
+    assert cache.get(1, lambda user_id: pytest.fail("should be cached")).is_admin
+
+
+def test_redis_entry_from_an_older_generation_is_ignored():
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = fakeredis.FakeRedis()
+    cache, other = make_cache(redis), make_cache(redis)
+
+    cache.get(1, racing_loader(cache))
+
+    assert not other.get(1, lambda user_id: user(is_admin=False)).is_admin
+    assert not other.get(1, lambda user_id: pytest.fail("should be cached")).is_admin
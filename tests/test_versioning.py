@@ -0,0 +1,28 @@
+from app import db
+from app.models import Book, ChangeCounter
+from app.utils.versioning import current_version
+
+
+def add_book(title):
+    db.session.add(Book(title=title, author="Author", total_copies=1, available_copies=1))
+    db.session.commit()
+
+
+def test_each_write_transaction_bumps_the_summed_version(app):
+    before = current_version(db.session, "books")
+    for index in range(20):
+        add_book(f"Book {index}")
+
+    assert current_version(db.session, "books") == before + 20
+    # Spread over shard rows rather than one hot row.
+    assert ChangeCounter.query.filter_by(name="books").count() > 1
+
+
+def test_unchanged_books_answer_304(app):
+    add_book("Dune")
+    client = app.test_client()
+    etag = client.get("/books").headers["ETag"]
+
+    assert client.get("/books", headers={"If-None-Match": etag}).status_code == 304
+    add_book("Emma")
+    assert client.get("/books", headers={"If-None-Match": etag}).status_code == 200